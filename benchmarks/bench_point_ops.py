@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from model.processing import Image, brightness_lut, contrast_lut, compose_luts
+
+
+def legacy_brightness(data: np.ndarray, brightness: int) -> np.ndarray:
+    if brightness > 0:
+        cv2.add(data, np.full(data.shape, brightness, dtype=np.uint8), data)
+    else:
+        cv2.subtract(data, np.full(data.shape, -brightness, dtype=np.uint8), data)
+    return data
+
+
+def legacy_contrast(data: np.ndarray, contrast: int) -> np.ndarray:
+    if contrast >= 0:
+        factor = (259 * (contrast + 255)) / (255 * (259 - contrast))
+    else:
+        factor = (259 * (contrast + 255)) / (255 * (259 + contrast))
+    return np.clip((factor * (data.astype(np.int16) - 128) + 128), 0, 255).astype(np.uint8)
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare legacy, per-op LUT and fused LUT point operations.")
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    width = int((args.megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(width * 2 / 3)
+    data = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    brightness, contrast = 25, 40
+
+    def legacy():
+        return legacy_contrast(legacy_brightness(data.copy(), brightness), contrast)
+
+    def per_op():
+        image = Image(data)
+        image.set_brightness(brightness)
+        image.set_contrast(contrast)
+        return image.data
+
+    def fused():
+        image = Image(data)
+        image.apply_lut(compose_luts(brightness_lut(brightness), contrast_lut(contrast)))
+        return image.data
+
+    assert np.array_equal(legacy(), fused())
+    print(f"{width}x{height} ({width * height / 1e6:.1f} MP), brightness + contrast")
+    timings = {name: best_of(func, args.repeat)
+               for name, func in (("legacy", legacy), ("per-op LUT", per_op), ("fused LUT", fused))}
+    for name, elapsed in timings.items():
+        print(f"{name:>12}: {elapsed * 1000:8.1f} ms  ({timings['legacy'] / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
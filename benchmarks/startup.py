@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Sequence, Union
+
+from benchmarks.suite import compare
+
+MODULES = ["model.model", "model.batch", "presenter.presenter"]
+HEAVY_MODULES = ["matplotlib", "PyQt5"]
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+__import__({module!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+_FIRST_FRAME_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from PyQt5.QtCore import QTimer
+import main
+app, view = main.create_app()
+ready = time.perf_counter()
+def done():
+    print(json.dumps({"window": ready - start, "first_frame": time.perf_counter() - start}))
+    app.quit()
+QTimer.singleShot(0, done)
+app.exec_()
+"""
+
+
+def _run(script: str) -> Union[dict, None]:
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if completed.returncode != 0:
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    runs = [_run(_IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)) for _ in range(repeat)]
+    runs = [run for run in runs if run is not None]
+    if not runs:
+        return {}
+    return {"elapsed": min(run["elapsed"] for run in runs), "loaded": runs[0]["loaded"]}
+
+
+def measure_first_frame(repeat: int) -> Union[dict, None]:
+    runs = [_run(_FIRST_FRAME_SCRIPT) for _ in range(repeat)]
+    runs = [run for run in runs if run is not None]
+    if not runs:
+        return None
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+def run_startup(modules: Sequence[str], repeat: int, log=sys.stderr) -> Dict[str, float]:
+    results = {}
+    for module in modules:
+        measured = measure_import(module, repeat)
+        if not measured:
+            print(f"could not import {module}", file=log)
+            continue
+        results[f"startup/import/{module}"] = measured["elapsed"]
+        if measured["loaded"]:
+            print(f"{module} eagerly imports {', '.join(measured['loaded'])}", file=log)
+    first_frame = measure_first_frame(repeat)
+    if first_frame is None:
+        print("skipping time-to-first-frame: the GUI could not start (is PyQt5 installed?)", file=log)
+    else:
+        results.update({f"startup/gui/{key}": elapsed for key, elapsed in first_frame.items()})
+    return results
+
+
+def main(argv: Union[Sequence[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Time cold imports and the GUI's time to first frame.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement (best is kept)")
+    parser.add_argument("-o", "--output", default=None, help="write results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown that counts as a regression (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run_startup(args.modules, args.repeat)
+    text = json.dumps({"meta": {"python": sys.version.split()[0]}, "results": results}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
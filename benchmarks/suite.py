@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Union
+
+import cv2
+import numpy as np
+
+from model.model import Model
+from model.parallel import BandExecutor
+from model.processing import Image
+from presenter.presenter import Presenter
+
+OPERATIONS = {
+    "brightness": (Image.set_brightness, 25),
+    "contrast": (Image.set_contrast, 40),
+    "average_filter": (Image.average_filter, 5),
+    "gaussian_blur": (Image.gaussian_blur, 9),
+    "gaussian_blur_large": (Image.gaussian_blur, 101),
+    "median_filter": (Image.median_filter, 5),
+    "sharpen": (Image.sharpen, 5),
+    "rotate_90": (Image.rotate, 90),
+    "rotate_30": (Image.rotate, 30),
+    "flip_horizontally": (Image.flip_horizontally, None),
+    "flip_vertically": (Image.flip_vertically, None),
+    "histograms": (Image.get_histograms, None),
+}
+
+FILTER_CHAINS = {
+    "blur_box": [("gaussian_blur", 9), ("average_filter", 5)],
+    "blur_box_blur": [("gaussian_blur", 5), ("average_filter", 5), ("gaussian_blur", 9)],
+    "soften": [("average_filter", 3), ("gaussian_blur", 7), ("average_filter", 3), ("gaussian_blur", 7)],
+}
+
+HISTORY_EDITS = [("brightness", 10), ("gaussian_blur", 5), ("contrast", 20), ("rotate", 90), ("sharpen", 3)]
+
+
+def synthetic_image(megapixels: float, channels: int, seed: int = 0) -> np.ndarray:
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, height // 8), max(1, width // 8), channels), dtype=np.uint8)
+    data = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR).reshape(height, width, channels)
+    noise = rng.integers(-8, 9, data.shape, dtype=np.int16)
+    return np.clip(data + noise, 0, 255).astype(np.uint8)
+
+
+def best_of(func: Callable, repeat: int, setup: Callable = lambda: None) -> float:
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_operations(data: np.ndarray, repeat: int, prefix: str) -> Dict[str, float]:
+    results = {}
+    for name, (method, value) in OPERATIONS.items():
+        args = () if value is None else (value,)
+        results[f"{prefix}/op/{name}"] = best_of(lambda image: method(image, *args), repeat, lambda: Image(data))
+    return results
+
+
+def bench_parallel(data: np.ndarray, workers: Sequence[int], repeat: int, prefix: str) -> Dict[str, float]:
+    results = {}
+    for count in workers:
+        executor = BandExecutor(workers=count, min_pixels=0)
+        try:
+            for name, (method, value) in OPERATIONS.items():
+                if executor.supports(method, value):
+                    results[f"{prefix}/parallel/{name}/{count}"] = best_of(
+                        lambda image: executor.run(image, method, value), repeat, lambda: Image(data))
+        finally:
+            executor.shutdown()
+    return results
+
+
+def bench_chains(data: np.ndarray, repeat: int, prefix: str) -> Dict[str, float]:
+    results = {}
+    methods = Model()._methods_map
+    for name, edits in FILTER_CHAINS.items():
+        def sequential(image):
+            for op, value in edits:
+                methods[op](image, value)
+        results[f"{prefix}/chain/{name}/sequential"] = best_of(sequential, repeat, lambda: Image(data))
+
+        model = Model(cache_budget=0)
+        model.set_image(Image(data))
+        for op, value in edits:
+            model.set_attribute(op, value)
+        results[f"{prefix}/chain/{name}/fused"] = best_of(lambda _: model.get_data(), repeat)
+    return results
+
+
+def fusion_speedup(results: Dict[str, float]) -> Dict[str, float]:
+    speedups = {}
+    for name, elapsed in results.items():
+        base, _, variant = name.rpartition("/")
+        if "/chain/" in name and variant == "fused":
+            speedups[base] = results[f"{base}/sequential"] / elapsed
+    return speedups
+
+
+def scaling_efficiency(results: Dict[str, float]) -> Dict[str, dict]:
+    scaling = {}
+    for name, elapsed in results.items():
+        base, _, count = name.rpartition("/")
+        if "/parallel/" not in name or count == "1" or f"{base}/1" not in results:
+            continue
+        speedup = results[f"{base}/1"] / elapsed
+        scaling[name] = {"speedup": speedup, "efficiency": speedup / int(count)}
+    return scaling
+
+
+def _history_model(data: np.ndarray, length: int) -> Model:
+    model = Model()
+    model.set_image(Image(data))
+    for idx in range(length):
+        # no accept(): an accepted edit is baked into a cached base and would not be replayed
+        model.set_attribute(*HISTORY_EDITS[idx % len(HISTORY_EDITS)])
+    return model
+
+
+def bench_replay(data: np.ndarray, lengths: Sequence[int], repeat: int, prefix: str) -> Dict[str, float]:
+    results = {}
+    for length in lengths:
+        model = _history_model(data, length)
+
+        def cold(_):
+            model._snapshots.clear()
+            model.get_data()
+        results[f"{prefix}/replay/cold/{length}"] = best_of(cold, repeat)
+
+        values = iter(range(1, 10 ** 6))
+
+        def warm(_):
+            model.set_attribute("brightness", next(values) % 100)
+            model.get_data()
+        model.set_attribute("brightness", 0)
+        model.get_data()
+        results[f"{prefix}/replay/last_edit/{length}"] = best_of(warm, repeat)
+    return results
+
+
+class _LatencyView:
+    def __init__(self):
+        self.rendered = threading.Event()
+        self.data_rendered = self
+
+    def emit(self, data, version):
+        self.rendered.set()
+
+
+def bench_latency(data: np.ndarray, repeat: int, prefix: str, viewport=(1600, 1000)) -> Dict[str, float]:
+    view = _LatencyView()
+    model = Model()
+    presenter = Presenter(model, view)
+    try:
+        model.set_image(Image(data))
+        presenter.handle_viewport_resized(*viewport)
+        values = iter(range(1, 10 ** 6))
+
+        def slider_tick(_):
+            view.rendered.clear()
+            presenter.handle_brightness_changed(next(values) % 100)
+            view.rendered.wait()
+        return {f"{prefix}/latency/slider": best_of(slider_tick, repeat)}
+    finally:
+        presenter.render_worker.stop()
+
+
+def run_suite(sizes: Sequence[float], channels: Sequence[int], history: Sequence[int], repeat: int,
+              log=sys.stderr, workers: Sequence[int] = ()) -> Dict[str, float]:
+    results = {}
+    for megapixels in sizes:
+        for num_channels in channels:
+            prefix = f"{megapixels:g}mp/{num_channels}ch"
+            print(f"benchmarking {prefix}", file=log)
+            data = synthetic_image(megapixels, num_channels)
+            results.update(bench_operations(data, repeat, prefix))
+            results.update(bench_replay(data, history, repeat, prefix))
+            results.update(bench_chains(data, repeat, prefix))
+            if workers:
+                results.update(bench_parallel(data, workers, repeat, prefix))
+            if num_channels == 3:
+                results.update(bench_latency(data, repeat, prefix))
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    regressions = []
+    for name, elapsed in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference and elapsed > reference * (1 + threshold):
+            regressions.append(f"{name}: {elapsed * 1000:.2f} ms vs {reference * 1000:.2f} ms "
+                               f"(+{(elapsed / reference - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv: Union[Sequence[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite",
+                                     description="Time Image operations, edit replay and slider latency.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 12, 50], help="image sizes in megapixels")
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--history", type=int, nargs="+", default=[1, 5, 10, 25, 50],
+                        help="edit-history lengths for the replay benchmarks")
+    parser.add_argument("--workers", type=int, nargs="*", default=sorted({1, os.cpu_count() or 1}),
+                        help="band-parallel worker counts to measure scaling with (default: 1 and CPU count)")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per measurement (best is kept)")
+    parser.add_argument("-o", "--output", default=None, help="write results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown that counts as a regression (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.channels, args.history, args.repeat, workers=args.workers)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "threads": cv2.getNumThreads(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+        "scaling": scaling_efficiency(results),
+        "fusion": fusion_speedup(results),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+from benchmarks import startup
+
+
+def test_model_does_not_import_matplotlib():
+    measured = startup.measure_import("model.model", 1)
+    assert measured["elapsed"] > 0
+    assert "matplotlib" not in measured["loaded"]
+
+
+def test_run_startup_reports_imports(tmp_path):
+    results = startup.run_startup(["model.batch"], 1, log=open(tmp_path / "log", "w"))
+    assert results["startup/import/model.batch"] > 0
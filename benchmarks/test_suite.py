@@ -0,0 +1,30 @@
+from benchmarks import suite
+
+
+def test_suite_smoke(tmp_path):
+    results = suite.run_suite([0.01], [1, 3], [1, 3], repeat=1, log=open(tmp_path / "log", "w"))
+    assert all(elapsed >= 0 for elapsed in results.values())
+    assert "0.01mp/3ch/latency/slider" in results
+    assert "0.01mp/1ch/replay/last_edit/3" in results
+    assert len([name for name in results if name.startswith("0.01mp/1ch/op/")]) == len(suite.OPERATIONS)
+
+
+def test_compare_flags_regressions():
+    baseline = {"a": 1.0, "b": 1.0}
+    assert suite.compare({"a": 1.2, "b": 0.5, "c": 9.0}, baseline, 0.25) == []
+    assert suite.compare({"a": 1.3}, baseline, 0.25) == ["a: 1300.00 ms vs 1000.00 ms (+30%)"]
+
+
+def test_parallel_scaling_is_reported(tmp_path):
+    results = suite.run_suite([0.01], [3], [1], repeat=1, log=open(tmp_path / "log", "w"), workers=[1, 2])
+    assert "0.01mp/3ch/parallel/median_filter/2" in results
+    scaling = suite.scaling_efficiency(results)
+    assert set(scaling) == {name for name in results if "/parallel/" in name and name.endswith("/2")}
+    assert all(entry["efficiency"] > 0 for entry in scaling.values())
+
+
+def test_filter_chains_are_reported(tmp_path):
+    results = suite.run_suite([0.01], [3], [1], repeat=1, log=open(tmp_path / "log", "w"))
+    speedups = suite.fusion_speedup(results)
+    assert set(speedups) == {f"0.01mp/3ch/chain/{name}" for name in suite.FILTER_CHAINS}
+    assert all(speedup > 0 for speedup in speedups.values())
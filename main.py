@@ -1,18 +1,36 @@
+import atexit
+import os
 import sys
+from typing import Tuple
 from PyQt5.QtWidgets import QApplication
 
+from model.decode_cache import DecodeCache
 from model.model import Model
+from model.parallel import BandExecutor
+from model.profiling import profiler
 from presenter.presenter import Presenter
 from view.view import ImageEditor
 
 
-def main() -> None:
+def create_app() -> Tuple[QApplication, ImageEditor]:
     app = QApplication([])
-    model = Model()
+    workers = os.environ.get("IMAGE_EDITOR_WORKERS")
+    decode_cache = os.environ.get("IMAGE_EDITOR_DECODE_CACHE")
+    model = Model(tiling=BandExecutor(int(workers) if workers else None),
+                  decode_cache=DecodeCache(decode_cache) if decode_cache else None)
     view = ImageEditor()
     presenter = Presenter(model, view)
     view.initUI(presenter)
     view.show()
+    return app, view
+
+
+def main() -> None:
+    trace_path = os.environ.get("IMAGE_EDITOR_TRACE")
+    if trace_path:
+        profiler.enable(track_memory=bool(os.environ.get("IMAGE_EDITOR_TRACE_MEMORY")), trace_path=trace_path)
+        atexit.register(profiler.disable)
+    app, _ = create_app()
     sys.exit(app.exec_())
 
 
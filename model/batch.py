@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Iterator, List, Sequence, Tuple, Union
+
+import cv2
+
+from model.model import Model
+from model.recipe import load_recipe, make_recipe, recipe_hash
+from model.render_cache import RenderCache
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+def parse_edit(text: str) -> Tuple[str, Any]:
+    name, _, value = text.partition("=")
+    if name not in Model()._methods_map:
+        raise argparse.ArgumentTypeError(f"unknown edit '{name}'")
+    if not value:
+        return name, None
+    try:
+        return name, int(value)
+    except ValueError:
+        try:
+            return name, float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid value for '{name}': {value}")
+
+
+def find_jobs(input_dir: Path, output_dir: Path, suffix: Union[str, None]) -> Iterator[Tuple[Path, Path]]:
+    for src in sorted(input_dir.rglob("*")):
+        if src.is_file() and src.suffix.lower() in IMAGE_EXTENSIONS:
+            dst = output_dir / src.relative_to(input_dir)
+            yield src, dst.with_suffix(suffix) if suffix else dst
+
+
+def recipe_path(dst: Path) -> Path:
+    return dst.with_name(f".{dst.name}.recipe")
+
+
+def is_up_to_date(src: Path, dst: Path, digest: str) -> bool:
+    if not dst.exists() or dst.stat().st_mtime < src.stat().st_mtime:
+        return False
+    try:
+        return recipe_path(dst).read_text() == digest
+    except OSError:
+        return False
+
+
+def _init_worker() -> None:
+    cv2.setNumThreads(1)
+
+
+def render_file(src: str, dst: str, recipe: dict, cache_dir: Union[str, None] = None) -> Tuple[str, str, float]:
+    try:
+        model = Model(render_cache=RenderCache(cache_dir) if cache_dir else None)
+        model.open_file(src)
+        model.apply_recipe(recipe)
+        dst_path = Path(dst)
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dst_path.with_name(f".{dst_path.stem}.partial{dst_path.suffix}")
+        model.save_file(str(tmp_path))
+        if not tmp_path.exists():
+            raise IOError(f"could not write {dst}")
+        recipe_path(dst_path).unlink(missing_ok=True)
+        os.replace(tmp_path, dst_path)
+        recipe_path(dst_path).write_text(recipe_hash(recipe))
+        height, width = model.image.data.shape[:2]
+        return "done", src, width * height / 1e6
+    except Exception as error:
+        return "failed", f"{src}: {error}", 0.0
+
+
+def run(jobs: List[Tuple[Path, Path]], recipe: dict, workers: int, max_in_flight: int,
+        force: bool = False, cache_dir: Union[str, None] = None) -> dict:
+    summary = {"done": 0, "skipped": 0, "failed": 0, "megapixels": 0.0, "errors": []}
+    digest = recipe_hash(recipe)
+    start = time.perf_counter()
+    pending = set()
+
+    def collect(futures):
+        for future in futures:
+            try:
+                status, message, megapixels = future.result()
+            except Exception as error:
+                status, message, megapixels = "failed", str(error), 0.0
+            summary[status] += 1
+            summary["megapixels"] += megapixels
+            if status == "failed":
+                summary["errors"].append(message)
+                print(f"error: {message}", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for src, dst in jobs:
+            if not force and is_up_to_date(src, dst, digest):
+                summary["skipped"] += 1
+                continue
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending.add(executor.submit(render_file, str(src), str(dst), recipe, cache_dir))
+        collect(wait(pending)[0])
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    elapsed = max(summary["elapsed"], 1e-9)
+    return (f"{summary['done']} rendered, {summary['skipped']} up to date, {summary['failed']} failed "
+            f"in {summary['elapsed']:.2f}s ({summary['done'] / elapsed:.1f} files/s, "
+            f"{summary['megapixels'] / elapsed:.1f} MP/s)")
+
+
+def main(argv: Union[Sequence[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m model.batch",
+        description="Apply the same edits to every image in a directory tree.")
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("-e", "--edit", dest="edits", action="append", type=parse_edit, default=[],
+                        metavar="NAME[=VALUE]",
+                        help="edit to apply, in order (e.g. brightness=20, rotate=90, flip_horizontally)")
+    parser.add_argument("-r", "--recipe", type=Path, default=None,
+                        help="JSON edit recipe to apply before any --edit options")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory of cached renders keyed by source and recipe hash")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="maximum number of files queued or rendering at once (default: 2 x jobs)")
+    parser.add_argument("--format", dest="suffix", default=None,
+                        help="output extension, e.g. .png (default: keep the input extension)")
+    parser.add_argument("--force", action="store_true", help="re-render outputs that are up to date")
+    args = parser.parse_args(argv)
+
+    if not args.input_dir.is_dir():
+        parser.error(f"{args.input_dir} is not a directory")
+    suffix = args.suffix if not args.suffix or args.suffix.startswith(".") else f".{args.suffix}"
+    try:
+        edits = load_recipe(str(args.recipe))["edits"] if args.recipe else []
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    recipe = make_recipe(edits + [{"op": name, "value": value} for name, value in args.edits])
+    jobs = list(find_jobs(args.input_dir, args.output_dir, suffix))
+    workers = max(1, args.jobs)
+    summary = run(jobs, recipe, workers, args.max_in_flight or 2 * workers, args.force, args.cache_dir)
+    print(format_summary(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import threading
+from collections import defaultdict
+from typing import Tuple
+
+import numpy as np
+
+
+class AllocationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.copies = 0
+            self.copy_bytes = 0
+            self.allocations = 0
+            self.allocation_bytes = 0
+            self.pool_hits = 0
+
+    def count_copy(self, nbytes: int) -> None:
+        with self._lock:
+            self.copies += 1
+            self.copy_bytes += nbytes
+
+    def count_allocation(self, nbytes: int) -> None:
+        with self._lock:
+            self.allocations += 1
+            self.allocation_bytes += nbytes
+
+    def count_pool_hit(self) -> None:
+        with self._lock:
+            self.pool_hits += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "copies": self.copies,
+                "copy_bytes": self.copy_bytes,
+                "allocations": self.allocations,
+                "allocation_bytes": self.allocation_bytes,
+                "pool_hits": self.pool_hits
+            }
+
+
+class BufferPool:
+    def __init__(self, budget: int):
+        self.budget = budget
+        self._buffers = defaultdict(list)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def acquire(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            if self._buffers[key]:
+                buffer = self._buffers[key].pop()
+                self._size -= buffer.nbytes
+                allocation_stats.count_pool_hit()
+                return buffer
+        buffer = np.empty(shape, dtype=dtype)
+        allocation_stats.count_allocation(buffer.nbytes)
+        return buffer
+
+    def release(self, buffer: np.ndarray) -> None:
+        if type(buffer) is not np.ndarray or buffer.base is not None or not buffer.flags.writeable:
+            return
+        with self._lock:
+            if self._size + buffer.nbytes > self.budget:
+                return
+            self._buffers[(buffer.shape, buffer.dtype)].append(buffer)
+            self._size += buffer.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffers.clear()
+            self._size = 0
+
+
+allocation_stats = AllocationStats()
+buffer_pool = BufferPool(256 * 1024 * 1024)
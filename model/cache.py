@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Sequence, Tuple, Union
+
+from model.processing import Image
+
+
+class SnapshotCache:
+    def __init__(self, budget: int) -> None:
+        self.budget = budget
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Union[Image, None]:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+            return image
+
+    def put(self, key: Hashable, image: Image) -> bool:
+        with self._lock:
+            nbytes = image.data.nbytes
+            if nbytes > self.budget:
+                return False
+            self.discard(key)
+            self._entries[key] = image
+            self._size += nbytes
+            while self._size > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.data.nbytes
+            return True
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            image = self._entries.pop(key, None)
+            if image is not None:
+                self._size -= image.data.nbytes
+
+    def longest_prefix(self, namespace: Hashable, actions: Sequence) -> Tuple[int, Union[Image, None]]:
+        with self._lock:
+            for length in range(len(actions), 0, -1):
+                image = self.get((namespace, tuple(actions[:length])))
+                if image is not None:
+                    return length, image
+            return 0, None
+
+    def retain_prefixes_of(self, actions: Sequence) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                prefix = key[1]
+                if len(prefix) > len(actions) or tuple(actions[:len(prefix)]) != prefix:
+                    self.discard(key)
+
+    def retain_namespaces(self, namespaces: Sequence) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] not in namespaces:
+                    self.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
@@ -0,0 +1,25 @@
+from typing import Tuple, Union
+
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def synthetic_image(tmp_path):
+    """Returns a factory for seeded random uint8 images.
+
+    With size, the noise is resized up to (width, height) so filters see smooth gradients rather than pure noise.
+    With name, the image is written under tmp_path and its path is returned instead of the array.
+    """
+    def make(shape: Tuple[int, ...], size: Union[Tuple[int, int], None] = None, name: Union[str, None] = None,
+             seed: int = 0) -> Union[np.ndarray, str]:
+        data = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+        if size is not None:
+            data = cv2.resize(data, size, interpolation=cv2.INTER_LINEAR)
+        if name is None:
+            return data
+        path = str(tmp_path / name)
+        cv2.imwrite(path, data)
+        return path
+    return make
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from model.processing import read_rgb
+from model.profiling import profiler
+from model.render_cache import file_digest
+
+
+class DecodeCache:
+    def __init__(self, directory: str, max_bytes: int = 4 * 1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _ref_path(self, image_path: str) -> Path:
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+        return self.directory / "refs" / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _data_path(self, digest: str, reduction: int) -> Path:
+        return self.directory / digest[:2] / f"{digest}-{reduction}.npy"
+
+    def _digest(self, ref_path: Path, image_path: str) -> str:
+        try:
+            return ref_path.read_text()
+        except OSError:
+            digest = file_digest(image_path)
+            self._write(ref_path, lambda f: f.write(digest.encode("ascii")))
+            return digest
+
+    def get(self, image_path: str, reduction: int = 1) -> Union[np.ndarray, None]:
+        path = self._data_path(self._digest(self._ref_path(image_path), image_path), reduction)
+        try:
+            data = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return data
+
+    def put(self, image_path: str, reduction: int, data: np.ndarray) -> None:
+        path = self._data_path(self._digest(self._ref_path(image_path), image_path), reduction)
+        self._write(path, lambda f: np.save(f, np.ascontiguousarray(data)))
+        self.evict()
+
+    def load(self, image_path: str, reduction: int = 1) -> np.ndarray:
+        with profiler.measure("decode", "cached"):
+            data = self.get(image_path, reduction)
+        if data is None:
+            data = read_rgb(image_path, reduction)
+            self.put(image_path, reduction, data)
+        return data
+
+    def size(self) -> int:
+        return sum(path.stat().st_size for path in self.directory.glob("??/*.npy"))
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("??/*.npy"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                return
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def _write(self, path: Path, write) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from model.processing import Image
+from model.profiling import profiler
+
+_ENCODER_OPTIONS = {
+    ".jpg": {"quality": cv2.IMWRITE_JPEG_QUALITY, "progressive": cv2.IMWRITE_JPEG_PROGRESSIVE},
+    ".jpeg": {"quality": cv2.IMWRITE_JPEG_QUALITY, "progressive": cv2.IMWRITE_JPEG_PROGRESSIVE},
+    ".png": {"compression": cv2.IMWRITE_PNG_COMPRESSION},
+    ".webp": {"quality": cv2.IMWRITE_WEBP_QUALITY},
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportTarget:
+    def __init__(self, path: str, quality: Union[int, None] = None, compression: Union[int, None] = None,
+                 progressive: bool = False, max_size: Union[int, None] = None):
+        self.path = str(path)
+        self.suffix = Path(self.path).suffix.lower()
+        self.quality = quality
+        self.compression = compression
+        self.progressive = progressive
+        self.max_size = max_size
+        supported = _ENCODER_OPTIONS.get(self.suffix, {})
+        requested = {"quality": quality is not None, "compression": compression is not None,
+                     "progressive": progressive}
+        for option, used in requested.items():
+            if used and option not in supported:
+                raise ValueError(f"{option} is not supported for '{self.suffix or self.path}' files")
+
+    def encoder_params(self) -> List[int]:
+        options = _ENCODER_OPTIONS.get(self.suffix, {})
+        params = []
+        if self.quality is not None:
+            params += [options["quality"], int(self.quality)]
+        if self.compression is not None:
+            params += [options["compression"], int(self.compression)]
+        if self.progressive:
+            params += [options["progressive"], 1]
+        return params
+
+    def output_size(self, width: int, height: int) -> Tuple[int, int]:
+        if self.max_size is None or max(width, height) <= self.max_size:
+            return width, height
+        scale = self.max_size / max(width, height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def write_atomically(path: str, payload: bytes) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".export-", suffix=Path(path).suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ExportJob:
+    def __init__(self, render: Callable[[], Image], targets: Sequence[ExportTarget],
+                 on_progress: Union[Callable[[float], None], None] = None,
+                 on_finished: Union[Callable[["ExportJob"], None], None] = None):
+        if not targets:
+            raise ValueError("an export needs at least one target")
+        self.render = render
+        self.targets = list(targets)
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.progress = 0.0
+        self.written = []
+        self.error = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._steps = 2 + len(self.targets)
+        self._thread = threading.Thread(target=self._run, name="ExportJob", daemon=True)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def start(self) -> "ExportJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def _step(self, done: int) -> None:
+        if self._cancelled.is_set():
+            raise ExportCancelled()
+        self.progress = done / self._steps
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+
+    def _run(self) -> None:
+        try:
+            self._step(0)
+            with profiler.measure("export", "render"):
+                data = self.render().data
+            self._step(1)
+            with profiler.measure("export", "convert"):
+                bgr = cv2.cvtColor(data, cv2.COLOR_RGB2BGR) if data.ndim == 3 and data.shape[2] == 3 else data
+            self._step(2)
+            height, width = bgr.shape[:2]
+            resized: Dict[Tuple[int, int], np.ndarray] = {(width, height): bgr}
+            for idx, target in enumerate(self.targets):
+                size = target.output_size(width, height)
+                if size not in resized:
+                    with profiler.measure("export", "resize"):
+                        resized[size] = cv2.resize(bgr, size, interpolation=cv2.INTER_AREA)
+                with profiler.measure("export", f"encode{target.suffix}"):
+                    ok, encoded = cv2.imencode(target.suffix, resized[size], target.encoder_params())
+                if not ok:
+                    raise IOError(f"could not encode {target.path}")
+                if self._cancelled.is_set():
+                    raise ExportCancelled()
+                write_atomically(target.path, encoded.tobytes())
+                self.written.append(target.path)
+                self._step(3 + idx)
+        except ExportCancelled:
+            pass
+        except Exception as error:
+            self.error = error
+        finally:
+            self._finished.set()
+            if self.on_finished is not None:
+                self.on_finished(self)
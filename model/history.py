@@ -0,0 +1,125 @@
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Sequence, Tuple, Union
+
+import cv2
+
+from model.processing import Image
+
+
+class Base:
+    _ids = itertools.count()
+
+    def __init__(self, parent: Union["Base", None], actions: Sequence):
+        self.parent = parent
+        self.actions = tuple(actions)
+        self.depth = 1 if parent is None else parent.depth + 1
+        self.key = next(self._ids)
+
+
+class BaseStore:
+    def __init__(self, budget: int, spill_dir: Union[str, None] = None, compression: int = 1):
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.compression = compression
+        self._images = OrderedDict()
+        self._spilled = {}
+        self._size = 0
+        self._pinned = None
+        self._directory = None
+        self._cleanup = None
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __contains__(self, key: Tuple[Base, float]) -> bool:
+        return key in self._images or key in self._spilled
+
+    def is_spilled(self, key: Tuple[Base, float]) -> bool:
+        return key in self._spilled
+
+    def pin(self, base: Union[Base, None]) -> None:
+        with self._lock:
+            self._pinned = base
+            self._evict()
+
+    def get(self, key: Tuple[Base, float]) -> Union[Image, None]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+            if key not in self._spilled:
+                return None
+            path, shape = self._spilled.pop(key)
+            data = cv2.imread(path, cv2.IMREAD_UNCHANGED).reshape(shape)
+            os.unlink(path)
+            image = Image(data, copy=False)
+            self._store(key, image)
+            return image
+
+    def put(self, key: Tuple[Base, float], image: Image) -> None:
+        with self._lock:
+            self.discard(key)
+            self._store(key, image)
+
+    def discard(self, key: Tuple[Base, float]) -> None:
+        with self._lock:
+            image = self._images.pop(key, None)
+            if image is not None:
+                self._size -= image.data.nbytes
+            spilled = self._spilled.pop(key, None)
+            if spilled is not None:
+                os.unlink(spilled[0])
+
+    def retain_bases(self, bases: Sequence[Base]) -> None:
+        with self._lock:
+            for key in list(self._images) + list(self._spilled):
+                if key[0] not in bases:
+                    self.discard(key)
+
+    def retain_scales(self, scales: Sequence[float]) -> None:
+        with self._lock:
+            for key in list(self._images) + list(self._spilled):
+                if key[1] not in scales:
+                    self.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self._spilled.clear()
+            self._size = 0
+            self._pinned = None
+            if self._cleanup is not None:
+                self._cleanup()
+                self._cleanup = self._directory = None
+
+    def _store(self, key: Tuple[Base, float], image: Image) -> None:
+        self._images[key] = image
+        self._size += image.data.nbytes
+        self._evict()
+
+    def _evict(self) -> None:
+        for key in list(self._images):
+            if self._size <= self.budget:
+                return
+            if key[0] is not self._pinned:
+                self._spill(key, self._images.pop(key))
+
+    def _spill(self, key: Tuple[Base, float], image: Image) -> None:
+        self._size -= image.data.nbytes
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="image-editor-history-", dir=self.spill_dir)
+            self._cleanup = weakref.finalize(self, shutil.rmtree, self._directory, True)
+        path = os.path.join(self._directory, f"{key[0].key}-{key[1]}.png")
+        ok, encoded = cv2.imencode(".png", image.data, [cv2.IMWRITE_PNG_COMPRESSION, self.compression])
+        if ok:
+            encoded.tofile(path)
+            self._spilled[key] = (path, image.data.shape)
@@ -1,17 +1,51 @@
-from model.processing import Image
+from model.buffers import buffer_pool
+from model.cache import SnapshotCache
+from model.decode_cache import DecodeCache
+from model.export import ExportJob, ExportTarget
+from model.history import Base, BaseStore
+from model.profiling import profiler
+from model.recipe import make_recipe, recipe_hash
+from model.region import output_shape, render_region
+from model.render_cache import RenderCache, file_digest
+from model.processing import (Image, LinearFilter, brightness_lut, contrast_lut, compose_luts, rotation_matrix,
+                              compose_transforms, remap_histograms, create_histogram_figure, box_filter,
+                              gaussian_filter, compose_filters, FLIP_HORIZONTALLY, FLIP_VERTICALLY)
 from model.signal import Signal
+from model.tiling import TiledExecutor
 
+import cv2
+import os
+import threading
+import traceback
 import numpy as np
-import matplotlib.pyplot as plt
-from typing import Union, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from typing import TYPE_CHECKING, Union, Any, Tuple, Callable, Sequence, List
 
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+def _accepted(value: Any) -> bool:
+    return True
 
 
 class Model():
-    image_changed = Signal()
+    HISTOGRAM_CACHE_SIZE = 64
+    PROGRESSIVE_REDUCTION = 4
+    PROGRESSIVE_MIN_BYTES = 1024 * 1024
+    PROGRESSIVE_EXTENSIONS = {".jpg", ".jpeg"}
+    REGION_TILE_SIZE = 256
 
-    def __init__(self):
+    def __init__(self, cache_budget: int = 256 * 1024 * 1024, tiling: Union[TiledExecutor, None] = None,
+                 render_cache: Union[RenderCache, None] = None, history_budget: int = 512 * 1024 * 1024,
+                 spill_dir: Union[str, None] = None, decode_cache: Union[DecodeCache, None] = None):
         self.image = None
+        self.tiling = tiling
+        self.render_cache = render_cache
+        self.decode_cache = decode_cache
+        self._source_hash = None
         self._methods_map = {
             "brightness": Image.set_brightness, 
             "contrast": Image.set_contrast, 
@@ -26,60 +60,548 @@ class Model():
         self._following_methods = {
             "flip_horizontally", "flip_vertically", "rotate"
         }
+        self._spatial_methods = {
+            Image.average_filter, Image.gaussian_blur, Image.median_filter
+        }
+        self._point_luts = {
+            Image.set_brightness: brightness_lut,
+            Image.set_contrast: contrast_lut
+        }
+        self._geometric_transforms = {
+            Image.rotate: rotation_matrix,
+            Image.flip_horizontally: lambda _: FLIP_HORIZONTALLY,
+            Image.flip_vertically: lambda _: FLIP_VERTICALLY
+        }
+        self._linear_filters = {
+            Image.average_filter: box_filter,
+            Image.gaussian_blur: gaussian_filter
+        }
+        self._fusions = (
+            (self._point_luts, compose_luts, Image.apply_lut),
+            (self._geometric_transforms, compose_transforms, Image.transform),
+            (self._linear_filters, compose_filters, Image.apply_linear)
+        )
+        self.image_changed = Signal()
+        self.image_loaded = Signal()  # emitted on the decoding thread once a progressive open has the full image
         self._edit_actions = []
         self._last_accepted_idx = 0
+        self._base = None
+        self._bases = BaseStore(history_budget, spill_dir)
+        self._snapshots = SnapshotCache(cache_budget)
+        self._tiles = SnapshotCache(cache_budget // 4)
+        self._histograms = OrderedDict()
+        self._histograms_lock = threading.Lock()
+        self._viewport = None
+        self._proxy = None
+        self._proxy_size = None
+        self._proxy_scale = 1.0
+        self._source_size = None
+        self._image_lock = threading.RLock()
+        self._load_generation = 0
+        self._load_error = None
+        self._loaded = threading.Event()
+        self._loaded.set()
+
+    def _preview_reduction(self, image_path: str) -> int:
+        if os.path.splitext(image_path)[1].lower() not in self.PROGRESSIVE_EXTENSIONS:
+            return 1
+        if os.path.getsize(image_path) < self.PROGRESSIVE_MIN_BYTES:
+            return 1
+        if self.decode_cache is not None and self.decode_cache.get(image_path) is not None:
+            return 1
+        return self.PROGRESSIVE_REDUCTION
+
+    def open_file(self, image_path: str, progressive: bool = False):
+        reduction = self._preview_reduction(image_path) if progressive else 1
+        image = Image.open(image_path, reduction, self.decode_cache)
+        with self._image_lock:
+            self._load_generation += 1
+            generation = self._load_generation
+            self._load_error = None
+            self._bases.clear()
+            self._set_base(None, [], 0)
+            self.image = image
+            height, width = image.data.shape[:2]
+            self._source_size = (height * reduction, width * reduction) if reduction != 1 else None
+            self._source_hash = file_digest(image_path) if self.render_cache is not None else None
+            self._proxy = self._proxy_size = None
+            self._update_proxy()
+            if reduction != 1:
+                self._loaded.clear()
+                threading.Thread(target=self._load_full, args=(image_path, generation),
+                                 name="FullDecode", daemon=True).start()
+            else:
+                self._loaded.set()
+        self.image_changed.emit()
 
-    def open_file(self, image_path: str):
-        self._edit_actions.clear()
-        self.image = Image.open(image_path)
+    def set_image(self, image: Image):
+        with self._image_lock:
+            self._load_generation += 1
+            self._load_error = None
+            self._loaded.set()
+            self._bases.clear()
+            self._set_base(None, [], 0)
+            self.image = image
+            self._source_size = None
+            self._source_hash = None
+            self._proxy = self._proxy_size = None
+            self._update_proxy()
         self.image_changed.emit()
 
-    def save_file(self, image_path: str):
+    def _load_full(self, image_path: str, generation: int):
+        try:
+            image = Image.open(image_path, cache=self.decode_cache)
+        except Exception as error:
+            traceback.print_exc()
+            with self._image_lock:
+                if generation == self._load_generation:
+                    self._load_error = error
+                    self._loaded.set()
+            return
+        with self._image_lock:
+            if generation != self._load_generation:
+                return
+            self.image = image
+            self._source_size = None
+            self._bases.clear()
+            self._set_base(self._rebase(self._base), self._edit_actions, self._last_accepted_idx)
+            self._proxy = self._proxy_size = None
+            self._update_proxy()
+            self._loaded.set()
+        self.image_loaded.emit()
+
+    @property
+    def is_loading(self) -> bool:
+        return not self._loaded.is_set()
+
+    def wait_until_loaded(self, timeout: Union[float, None] = None) -> bool:
+        loaded = self._loaded.wait(timeout)
+        if self._load_error is not None:
+            raise IOError(f"could not decode the full image: {self._load_error}")
+        return loaded
+
+    def export(self, targets: Sequence[ExportTarget], on_progress: Union[Callable[[float], None], None] = None,
+               on_finished: Union[Callable[[ExportJob], None], None] = None) -> ExportJob:
+        with self._image_lock:
+            if self.image is None:
+                raise ValueError("there is no image to export")
+            base, actions, generation = self._base, tuple(self._edit_actions), self._load_generation
+        return ExportJob(lambda: self._render_full(base, actions, generation), targets, on_progress,
+                         on_finished).start()
+
+    def save_file(self, image_path: str, **options):
         if self.image:
-            img = self._get_image_with_edits()
-            img.save(image_path)
+            job = self.export([ExportTarget(image_path, **options)])
+            job.wait()
+            if job.error is not None:
+                raise job.error
 
     def clear(self):
-        self.image = None
+        with self._image_lock:
+            self._load_generation += 1
+            self._load_error = None
+            self._loaded.set()
+            self.image = None
+            self._source_size = None
+            self._source_hash = None
+            self._proxy = self._proxy_size = None
+            self._bases.clear()
+            self._set_base(None, [], 0)
         self.image_changed.emit()
 
-    def _get_image_with_edits(self) -> Union[Image, None]:
-        img = self.image
-        for method, value, use_last in self._edit_actions:
-            if use_last:
-                img = Image(img.data)
-                if value is not None:
-                    method(img, value)
-                else:
-                    method(img)
+    def set_viewport_size(self, width: int, height: int):
+        self._viewport = (width, height)
+        scale = self._proxy_scale
+        self._update_proxy()
+        if self.image and scale != self._proxy_scale:
+            self.image_changed.emit()
+
+    def _fit_scale(self, size: Tuple[int, int]) -> float:
+        if self._viewport is None:
+            return 1.0
+        view_w, view_h = self._viewport
+        height, width = size
+        scale = max(min(view_w / width, view_h / height), min(view_w / height, view_h / width))
+        # powers of two, so resizing the window only rebuilds the proxy when it crosses one
+        return min(1.0, 2.0 ** np.ceil(np.log2(scale)))
+
+    def _update_proxy(self):
+        with self._image_lock:
+            if self.image is None:
+                return
+            height, width = self._source_size or self.image.data.shape[:2]
+            source_scale = self.image.data.shape[0] / height
+            scale = min(self._fit_scale((height, width)), source_scale)
+            if scale == self._proxy_scale and (self._proxy is not None or self._proxy_size is not None):
+                return
+            if scale < source_scale:
+                self._proxy = None
+                self._proxy_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            else:
+                self._proxy, self._proxy_size = self.image, None
+            self._proxy_scale = scale
+            self._snapshots.retain_namespaces((self._namespace(self._base, 1.0), self._namespace(self._base, scale)))
+            self._bases.retain_scales((1.0, scale))
+            self._clear_histograms()
+
+    def _proxy_job(self) -> Callable[[], Image]:
+        # called with the image lock held; the resize runs on whichever thread calls the job
+        if self._proxy is not None:
+            proxy = self._proxy
+            return lambda: proxy
+        return partial(self._build_proxy, self.image, self._proxy_size)
+
+    def _build_proxy(self, root: Image, size: Tuple[int, int]) -> Image:
+        with profiler.measure("display", "proxy"):
+            proxy = Image(cv2.resize(root.data, size, interpolation=cv2.INTER_AREA))
+        with self._image_lock:
+            if self.image is root and self._proxy_size == size and self._proxy is None:
+                self._proxy = proxy
+        return proxy
+
+    def _scaled_value(self, method, value: Any, scale: float) -> Any:
+        if scale != 1.0 and method in self._spatial_methods:
+            return max(0, round(value * scale))
+        return value
+
+    def _fusion_for(self, method: Callable) -> Union[Tuple, None]:
+        for fusion in self._fusions:
+            if method in fusion[0]:
+                return fusion
+        return None
+
+    def _fused_run(self, actions: Sequence, start: int, factories: dict, compose: Callable,
+                   scale: float = 1.0) -> Tuple[int, Any]:
+        fused = None
+        end = start
+        for idx in range(start, len(actions)):
+            method, value, use_last = actions[idx]
+            if use_last and method in factories:
+                step = factories[method](self._scaled_value(method, value, scale))
+                composed = step if fused is None else compose(fused, step)
+                if composed is None:
+                    break
+                fused = composed
+            elif use_last:
+                break
             else:
                 method(value)
+            end = idx + 1
+        return end, fused
+
+    def _apply(self, img: Image, method: Callable, value: Any) -> Image:
+        with profiler.measure("op", method.__name__):
+            if self.tiling is not None and self.tiling.should_tile(img):
+                return self.tiling.run(img, method, value)
+            result = img.share()
+            if value is not None:
+                method(result, value)
+            else:
+                method(result)
+            return result
+
+    def _steps(self, actions: Sequence) -> List[Tuple[Callable, Any]]:
+        steps = []
+        idx = 0
+        while idx < len(actions):
+            if not actions[idx][2]:
+                idx += 1
+                continue
+            idx, method, value = self._next_step(actions, idx)
+            steps.append((method, value))
+        return steps
+
+    def _next_step(self, actions: Sequence, start: int, scale: float = 1.0) -> Tuple[int, Callable, Any]:
+        method, value, _ = actions[start]
+        fusion = self._fusion_for(method)
+        if fusion is None:
+            return start + 1, method, self._scaled_value(method, value, scale)
+        factories, compose, apply = fusion
+        end, fused = self._fused_run(actions, start, factories, compose, scale)
+        if isinstance(fused, LinearFilter) and len(fused.ops) == 1:
+            return end, fused.ops[0][0], fused.ops[0][1]
+        return end, apply, fused
+
+    def _namespace(self, base: Union[Base, None], scale: float) -> Tuple[Union[int, None], float]:
+        return base.key if base is not None else None, scale
+
+    def _chain(self, base: Union[Base, None]) -> List[Base]:
+        chain = []
+        while base is not None:
+            chain.append(base)
+            base = base.parent
+        return chain[::-1]
+
+    def _rebase(self, base: Union[Base, None]) -> Union[Base, None]:
+        rebased = None
+        for node in self._chain(base):
+            rebased = Base(rebased, node.actions)
+        return rebased
+
+    def _history_actions(self, base: Union[Base, None], actions: Sequence) -> List:
+        history = []
+        for node in self._chain(base):
+            history += list(node.actions) + [(_accepted, None, False)]
+        return history + list(actions)
+
+    def _set_base(self, base: Union[Base, None], actions: Sequence, last_accepted_idx: int):
+        self._base = base
+        self._edit_actions = list(actions)
+        self._last_accepted_idx = last_accepted_idx
+        self._snapshots.clear()
+        self._tiles.clear()
+        self._clear_histograms()
+        self._bases.retain_bases(set(self._chain(base)))
+        self._bases.pin(base)
+
+    def _base_image(self, base: Union[Base, None], root: Image, scale: float) -> Image:
+        pending = []
+        image = None
+        while base is not None:
+            image = self._bases.get((base, scale))
+            if image is not None:
+                break
+            pending.append(base)
+            base = base.parent
+        else:
+            image = root
+        for node in reversed(pending):
+            image = self._render(image, scale, node.actions)
+            self._bases.put((node, scale), image)
+        return image
+
+    def _render(self, source: Image, scale: float, actions: Sequence, namespace: Any = None) -> Image:
+        with profiler.measure("replay", "preview" if scale != 1.0 else "full"):
+            return self._replay(source, scale, actions, namespace)
+
+    def _render_edits(self, base: Union[Base, None], root: Image, scale: float, actions: Sequence) -> Image:
+        return self._render(self._base_image(base, root, scale), scale, actions, self._namespace(base, scale))
+
+    def _replay(self, source: Image, scale: float, actions: Sequence, namespace: Any = None) -> Image:
+        start, img = self._snapshots.longest_prefix(namespace, actions) if namespace is not None else (0, None)
+        if img is None:
+            img = source
+        transient = None
+        idx = start
+        while idx < len(actions):
+            method, value, use_last = actions[idx]
+            if not use_last:
+                method(value)
+                idx += 1
+                continue
+            idx, method, value = self._next_step(actions, idx, scale)
+            previous, img = img, self._apply(img, method, value)
+            if not np.may_share_memory(img.data, previous.data):
+                # only buffers written by this replay are handed back, never the source or a snapshot
+                if transient is not None:
+                    buffer_pool.release(transient.data)
+                transient = img
+            elif transient is not None:
+                transient = img
+            if namespace is not None and self._snapshots.put((namespace, tuple(actions[:idx])), img):
+                transient = None
+        return img
+
+    def _get_image_with_edits(self, preview: bool = False) -> Union[Image, None]:
+        if self.image is None:
+            return None
+        if preview:
+            with self._image_lock:
+                base, proxy, scale = self._base, self._proxy_job(), self._proxy_scale
+            return self._render_edits(base, proxy(), scale, self._edit_actions)
+        return self._render_full(self._base, self._edit_actions, self._load_generation)
+
+    def _render_full(self, base: Union[Base, None], actions: Sequence, generation: int) -> Image:
+        self.wait_until_loaded()
+        with self._image_lock:
+            if generation != self._load_generation:
+                raise RuntimeError("the image was replaced before it could be rendered")
+            root, source_hash = self.image, self._source_hash
+        if self.render_cache is None or source_hash is None:
+            return self._render_edits(base, root, 1.0, actions)
+        key = recipe_hash(self._recipe_for(self._history_actions(base, actions)))
+        img = self.render_cache.get(source_hash, key)
+        if img is None:
+            img = self._render_edits(base, root, 1.0, actions)
+            self.render_cache.put(source_hash, key, img)
         return img
 
+    def get_render_job(self) -> Callable[[], Union[np.ndarray, None]]:
+        with self._image_lock:
+            if self.image is None:
+                return lambda: None
+            base, proxy, scale, actions = self._base, self._proxy_job(), self._proxy_scale, tuple(self._edit_actions)
+        return lambda: self._render_edits(base, proxy(), scale, actions).data
+
+    def get_output_size(self) -> Union[Tuple[int, int], None]:
+        with self._image_lock:
+            if self.image is None:
+                return None
+            return self._output_shape(self._base, self.image, self._edit_actions)
+
+    def _output_shape(self, base: Union[Base, None], root: Image, actions: Sequence) -> Tuple[int, int]:
+        return output_shape(root.data.shape[:2], self._steps(self._history_actions(base, actions)))
+
+    def get_region_job(self, fractions: Tuple[float, float, float, float]) -> Callable[[], Union[np.ndarray, None]]:
+        with self._image_lock:
+            if self.image is None:
+                return lambda: None
+            base, root, actions = self._base, self.image, tuple(self._edit_actions)
+            height, width = self._output_shape(base, root, actions)
+        top, bottom, left, right = fractions
+        bounds = (min(height - 1, int(top * height)), max(1, min(height, int(np.ceil(bottom * height)))),
+                  min(width - 1, int(left * width)), max(1, min(width, int(np.ceil(right * width)))))
+        return lambda: self._render_region(base, root, actions, bounds).data
+
+    def _render_region(self, base: Union[Base, None], root: Image, actions: Sequence,
+                       bounds: Tuple[int, int, int, int]) -> Image:
+        steps = self._steps(actions)
+        source = self._base_image(base, root, 1.0)
+        height, width = output_shape(source.data.shape[:2], steps)
+        size = self.REGION_TILE_SIZE
+        y0, y1, x0, x1 = bounds
+        namespace = self._namespace(base, 1.0)
+        tiles = {}
+        for ty in range(y0 // size, (y1 - 1) // size + 1):
+            for tx in range(x0 // size, (x1 - 1) // size + 1):
+                tiles[(ty, tx)] = self._tiles.get(((namespace, ty, tx), actions))
+        missing = [tile for tile, image in tiles.items() if image is None]
+        if missing:
+            rows, cols = [ty for ty, _ in missing], [tx for _, tx in missing]
+            top, left = min(rows) * size, min(cols) * size
+            span = (top, min(height, (max(rows) + 1) * size), left, min(width, (max(cols) + 1) * size))
+            with profiler.measure("replay", "region"):
+                rendered = render_region(source, steps, span)
+            if rendered is None:
+                full = self._render(source, 1.0, actions, namespace)
+                rendered = Image(full.data[span[0]:span[1], span[2]:span[3]], copy=False)
+            for ty, tx in missing:
+                tile = Image(rendered.data[ty * size - top:min(height, (ty + 1) * size) - top,
+                                           tx * size - left:min(width, (tx + 1) * size) - left])
+                self._tiles.put(((namespace, ty, tx), actions), tile)
+                tiles[(ty, tx)] = tile
+        out = np.empty((y1 - y0, x1 - x0) + source.data.shape[2:], dtype=source.data.dtype)
+        for (ty, tx), tile in tiles.items():
+            top, left = max(y0, ty * size), max(x0, tx * size)
+            bottom, right = min(y1, (ty + 1) * size), min(x1, (tx + 1) * size)
+            out[top - y0:bottom - y0, left - x0:right - x0] = \
+                tile.data[top - ty * size:bottom - ty * size, left - tx * size:right - tx * size]
+        return Image(out, copy=False)
+
+    def get_image(self) -> Union[Image, None]:
+        return self._get_image_with_edits()
+
     def get_data(self) -> Union[np.ndarray, None]:
-        return self._get_image_with_edits().data if self.image else None
+        return self._get_image_with_edits(preview=True).data if self.image else None
 
-    def get_histogram_figure(self) -> Union[plt.figure, None]:
-        image = self._get_image_with_edits()
-        return image.create_histogram_figure() if self.image else None
+    def _clear_histograms(self):
+        with self._histograms_lock:
+            self._histograms.clear()
+
+    def _histogram_for(self, base: Union[Base, None], root: Image, scale: float, actions: Sequence) -> np.ndarray:
+        key = (self._namespace(base, scale), tuple(actions))
+        with self._histograms_lock:
+            if key in self._histograms:
+                self._histograms.move_to_end(key)
+                return self._histograms[key]
+        split = len(actions)
+        while split > 0 and (not actions[split - 1][2] or actions[split - 1][0] in self._point_luts):
+            split -= 1
+        _, lut = self._fused_run(actions, split, self._point_luts, compose_luts)
+        if lut is not None:
+            histograms = remap_histograms(self._histogram_for(base, root, scale, actions[:split]), lut)
+        else:
+            histograms = self._render_edits(base, root, scale, actions).get_histograms()
+        with self._histograms_lock:
+            self._histograms[key] = histograms
+            while len(self._histograms) > self.HISTOGRAM_CACHE_SIZE:
+                self._histograms.popitem(last=False)
+        return histograms
+
+    def get_histogram(self) -> Union[np.ndarray, None]:
+        if self.image is None:
+            return None
+        with self._image_lock:
+            base, proxy, scale = self._base, self._proxy_job(), self._proxy_scale
+        return self._histogram_for(base, proxy(), scale, tuple(self._edit_actions))
+
+    def get_histogram_figure(self) -> Union["Figure", None]:
+        return create_histogram_figure(self.get_histogram()) if self.image else None
+
+    @contextmanager
+    def batch(self):
+        with self.image_changed.coalesce():
+            yield self
 
     def set_attribute(self, name: str, value: Any):
         if name in self._methods_map:
             action = (self._methods_map[name], value, True)
-            if self._edit_actions and self._edit_actions[-1][0] == self._methods_map[name] and name not in self._following_methods:
-                self._edit_actions[-1] = action
-            else:
-                self._edit_actions.append(action)
+            with self._image_lock:
+                if self._edit_actions and self._edit_actions[-1][0] == self._methods_map[name] and name not in self._following_methods:
+                    self._edit_actions[-1] = action
+                else:
+                    self._edit_actions.append(action)
             self.image_changed.emit()
 
+    def get_recipe(self) -> dict:
+        return self._recipe_for(self._history_actions(self._base, self._edit_actions))
+
+    def get_steps(self) -> List[Tuple[str, Any]]:
+        with self._image_lock:
+            history = [base.actions for base in self._chain(self._base)] + [list(self._edit_actions)]
+        return [(method.__name__, value) for actions in history for method, value in self._steps(actions)]
+
+    def _recipe_for(self, actions: Sequence) -> dict:
+        names = {method: name for name, method in self._methods_map.items()}
+        edits = []
+        for method, value, use_last in actions:
+            if method is _accepted:
+                edits.append({"op": "accept"})
+            elif method in names:
+                edits.append({"op": names[method], "value": value})
+        return make_recipe(edits)
+
+    def apply_recipe(self, recipe: dict):
+        # edits are appended as listed; set_attribute would merge repeats of the same op like a slider drag
+        with self.batch():
+            for edit in recipe["edits"]:
+                if edit["op"] == "accept":
+                    self.accept()
+                elif edit["op"] in self._methods_map:
+                    with self._image_lock:
+                        self._edit_actions.append((self._methods_map[edit["op"]], edit.get("value"), True))
+                    self.image_changed.emit()
+                else:
+                    raise ValueError(f"unknown edit '{edit['op']}'")
+
     def accept(self):
-        self._edit_actions.append((lambda v: True, None, False))
-        self._last_accepted_idx = len(self._edit_actions)
+        with self._image_lock:
+            base = Base(self._base, self._edit_actions)
+            for scale in {1.0, self._proxy_scale}:
+                image = self._snapshots.get((self._namespace(self._base, scale), base.actions))
+                if image is not None:
+                    self._bases.put((base, scale), image)
+            self._set_base(base, [], 0)
 
     def cancel_accept(self):
-        self._last_accepted_idx = max(0, len(self._edit_actions) - 1)
-        self.cancel()
+        with self._image_lock:
+            base = self._base
+            if base is None:
+                self._last_accepted_idx = max(0, len(self._edit_actions) - 1)
+                self._cancel_edits()
+            else:
+                images = {scale: self._bases.get((base, scale)) for scale in {1.0, self._proxy_scale}}
+                self._set_base(base.parent, base.actions, len(base.actions))
+                for scale, image in images.items():
+                    if image is not None and base.actions:
+                        self._snapshots.put((self._namespace(base.parent, scale), base.actions), image)
+        self.image_changed.emit()
 
     def cancel(self):
+        with self._image_lock:
+            self._cancel_edits()
+        self.image_changed.emit()
+
+    def _cancel_edits(self):
         self._edit_actions = self._edit_actions[:self._last_accepted_idx]
-        self.image_changed.emit()
\ No newline at end of file
+        self._snapshots.retain_prefixes_of(self._edit_actions)
@@ -0,0 +1,44 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple, Union
+
+import numpy as np
+
+from model.buffers import buffer_pool
+from model.processing import Image
+from model.profiling import profiler
+from model.tiling import Bounds, TiledExecutor
+
+
+class BandExecutor(TiledExecutor):
+    def __init__(self, workers: Union[int, None] = None, min_pixels: int = 1024 * 1024, bands_per_worker: int = 2):
+        super().__init__()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.min_pixels = min_pixels
+        self.bands_per_worker = bands_per_worker
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Band") if self.workers > 1 else None
+
+    def should_tile(self, image: Image) -> bool:
+        height, width = image.data.shape[:2]
+        return self._pool is not None and height * width >= self.min_pixels
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        return buffer_pool.acquire(shape, dtype)
+
+    def _tiles(self, height: int, width: int) -> Iterator[Bounds]:
+        band_height = max(1, math.ceil(height / (self.workers * self.bands_per_worker)))
+        for y0 in range(0, height, band_height):
+            yield y0, min(y0 + band_height, height), 0, width
+
+    def _map(self, func: Callable[[Bounds], None], tiles: Iterable[Bounds]) -> None:
+        if self._pool is None:
+            return super()._map(func, tiles)
+        task = profiler.task(func)
+        for future in [self._pool.submit(task, tile) for tile in tiles]:
+            future.result()
@@ -1,103 +1,325 @@
 from __future__ import annotations
 
+import functools
+import math
+from typing import TYPE_CHECKING, Callable, Sequence, Tuple, Union
+
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
+
+from model.buffers import allocation_stats, buffer_pool
+from model.profiling import profiler
+
+if TYPE_CHECKING:
+    from model.decode_cache import DecodeCache
+    from matplotlib.figure import Figure
+
+
+def brightness_lut(brightness: int) -> np.ndarray:
+    values = np.arange(256, dtype=np.int16) + int(brightness)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+def contrast_lut(contrast: int) -> np.ndarray:
+    if contrast >= 0:
+        factor = (259 * (contrast + 255)) / (255 * (259 - contrast))
+    else:
+        factor = (259 * (contrast + 255)) / (255 * (259 + contrast))
+    values = np.arange(256, dtype=np.int16) - 128
+    return np.clip((factor * values + 128), 0, 255).astype(np.uint8)
+
+
+def compose_luts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    return second[first]
+
+
+def remap_histograms(histograms: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    return np.stack([np.bincount(lut, weights=hist, minlength=256) for hist in histograms]).astype(np.int64)
+
+
+def create_histogram_figure(histograms: np.ndarray) -> Figure:
+    from matplotlib.figure import Figure
+    figure = Figure()
+    ax = figure.add_subplot(111)
+    colors = ("red", "green", "blue") if len(histograms) == 3 else ("black",) * len(histograms)
+    for hist, color in zip(histograms, colors):
+        ax.plot(hist, color=color)
+    ax.set_title("Histogram")
+    return figure
+
+
+FLIP_HORIZONTALLY = np.array([[-1.0, 0.0], [0.0, 1.0]])
+FLIP_VERTICALLY = np.array([[1.0, 0.0], [0.0, -1.0]])
+
+_EXACT_TRANSFORMS = {
+    ((1, 0), (0, 1)): None,
+    ((-1, 0), (0, 1)): lambda src, dst: cv2.flip(src, 1, dst),
+    ((1, 0), (0, -1)): lambda src, dst: cv2.flip(src, 0, dst),
+    ((-1, 0), (0, -1)): lambda src, dst: cv2.flip(src, -1, dst),
+    ((0, 1), (-1, 0)): lambda src, dst: cv2.rotate(src, cv2.ROTATE_90_COUNTERCLOCKWISE, dst),
+    ((0, -1), (1, 0)): lambda src, dst: cv2.rotate(src, cv2.ROTATE_90_CLOCKWISE, dst),
+    ((0, 1), (1, 0)): lambda src, dst: cv2.transpose(src, dst),
+    ((0, -1), (-1, 0)): lambda src, dst: cv2.flip(cv2.transpose(src, dst), -1, dst),
+}
+
+
+_REDUCED_DECODES = {
+    1: 0,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+}
+_IMREAD_COLOR_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+
+
+def read_rgb(image_path: str, reduction: int = 1) -> np.ndarray:
+    if reduction not in _REDUCED_DECODES:
+        raise ValueError(f"unsupported reduction {reduction}, expected one of {sorted(_REDUCED_DECODES)}")
+    with profiler.measure("decode", f"1/{reduction}"):
+        if _IMREAD_COLOR_RGB is not None:
+            data = cv2.imread(image_path, _REDUCED_DECODES[reduction] | _IMREAD_COLOR_RGB)
+        else:
+            data = cv2.imread(image_path, _REDUCED_DECODES[reduction] | cv2.IMREAD_COLOR)
+            if data is not None:
+                cv2.cvtColor(data, cv2.COLOR_BGR2RGB, data)
+    if data is None:
+        raise IOError(f"could not read {image_path}")
+    return data
+
+
+def valid_kernel_size(size: int) -> int:
+    return size if size % 2 == 1 and size > 1 else max(3, size + 1)
+
+
+GAUSSIAN_PYRAMID_MIN_SIZE = 31
+_PYRAMID_MIN_SIGMA = 2.0
+
+
+def _pyramid_levels(sigma: float) -> Tuple[int, float]:
+    levels = 0
+    while True:
+        variance = sigma ** 2 - 2 * (4 ** (levels + 1) - 1) / 3
+        if variance <= 0 or variance ** 0.5 / 2 ** (levels + 1) < _PYRAMID_MIN_SIGMA:
+            break
+        levels += 1
+    return levels, (sigma ** 2 - 2 * (4 ** levels - 1) / 3) ** 0.5 / 2 ** levels
+
+
+def pyramid_error_bound(size: int) -> float:
+    """Worst-case distance in grey levels between pyramid_gaussian_blur and the exact (float) Gaussian.
+
+    Each of the 2 * levels + 1 uint8 passes rounds by at most 0.5, and the binomial pyramid kernel differs
+    from the Gaussian by at most 1.5 grey levels (half the L1 norm of the kernel difference times 255,
+    at most 1.28 for every odd size from 31 to 401).
+    """
+    return _pyramid_levels(size / 6)[0] + 2
+
+
+def pyramid_gaussian_blur(src: np.ndarray, size: int, dst: Union[np.ndarray, None] = None) -> np.ndarray:
+    """Approximates GaussianBlur(src, (size, size), size / 6) to within pyramid_error_bound(size) grey levels."""
+    pad = size // 2
+    levels, sigma = _pyramid_levels(size / 6)
+    pyramid = [cv2.copyMakeBorder(src, pad, pad, pad, pad, cv2.BORDER_REFLECT_101)]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    kernel_size = 2 * math.ceil(3 * sigma) + 1
+    blurred = cv2.GaussianBlur(pyramid[-1], (kernel_size, kernel_size), sigma, None, sigma)
+    for level in reversed(pyramid[:-1]):
+        blurred = cv2.pyrUp(blurred, dstsize=(level.shape[1], level.shape[0]))
+    height, width = src.shape[:2]
+    result = blurred[pad:pad + height, pad:pad + width].reshape(src.shape)
+    if dst is None:
+        return np.ascontiguousarray(result)
+    np.copyto(dst, result)
+    return dst
+
+
+def gaussian_footprint(size: int) -> Tuple[int, int]:
+    if size < GAUSSIAN_PYRAMID_MIN_SIZE:
+        return size // 2, 1
+    levels, sigma = _pyramid_levels(size / 6)
+    return (math.ceil(3 * sigma) + 4) * 2 ** levels, 2 ** levels
+
+
+@functools.lru_cache(maxsize=32)
+def sharpen_kernel(size: int) -> np.ndarray:
+    other = -(size - 1) / 4
+    kernel = np.array([[0, other, 0], [other, size, other], [0, other, 0]], dtype=np.float32)
+    kernel.setflags(write=False)
+    return kernel
+
+
+LINEAR_PASS_COST = 8
+
+
+class LinearFilter:
+    def __init__(self, kernel: Union[np.ndarray, None], ops: Sequence[Tuple[Callable, int]], cost: int) -> None:
+        self.kernel = kernel
+        self.ops = tuple(ops)
+        self.cost = cost
+
+
+def _snap_to_integers(matrix: np.ndarray) -> np.ndarray:
+    rounded = np.round(matrix)
+    return np.where(np.abs(matrix - rounded) < 1e-9, rounded, matrix)
+
+
+def rotation_matrix(angle: float) -> np.ndarray:
+    return _snap_to_integers(cv2.getRotationMatrix2D((0, 0), angle, 1)[:, :2])
+
+
+def compose_transforms(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    return _snap_to_integers(second @ first)
 
 
 class Image:
-    def __init__(self, data: np.ndarray) -> None:
-        self.data = data.copy()
+    def __init__(self, data: np.ndarray, copy: bool = True) -> None:
+        if copy:
+            with profiler.measure("copy", "Image"):
+                self.data = data.copy()
+            allocation_stats.count_copy(data.nbytes)
+        else:
+            self.data = data
+        self._owned = copy
+
+    @classmethod
+    def _adopt(cls, data: np.ndarray) -> Image:
+        image = cls(data, copy=False)
+        image._owned = True
+        return image
+
+    @property
+    def owned(self) -> bool:
+        return self._owned
+
+    def share(self) -> Image:
+        self._owned = False
+        return Image(self.data, copy=False)
+
+    def _output(self, shape: tuple = None) -> np.ndarray:
+        shape = shape or self.data.shape
+        if self._owned and shape == self.data.shape:
+            return self.data
+        return buffer_pool.acquire(shape, self.data.dtype)
+
+    def _set_output(self, data: np.ndarray) -> None:
+        self.data = data
+        self._owned = True
 
     @property
     def num_channels(self):
         return self.data.shape[2]
 
     @classmethod
-    def open(cls, image_path: str) -> Image:
-        data = cv2.imread(image_path)
-        image = cv2.cvtColor(data, cv2.COLOR_BGR2RGB)
-        return cls(image)
+    def open(cls, image_path: str, reduction: int = 1, cache: Union[DecodeCache, None] = None) -> Image:
+        if cache is not None:
+            return cls(cache.load(image_path, reduction), copy=False)
+        return cls._adopt(read_rgb(image_path, reduction))
 
     def save(self, image_path: str) -> None:
         image = cv2.cvtColor(self.data, cv2.COLOR_RGB2BGR)
         cv2.imwrite(image_path, image)
 
     def get_histogram(self, channel: int) -> np.ndarray:
-        return np.histogram(self.data[:, :, channel], bins=256, range=(0, 256))[0]
-
-    def create_histogram_figure(self) -> plt.figure:
-        figure = plt.figure()
-        ax = figure.add_subplot(111)
-        if self.num_channels == 3:
-            colors = ("red", "green", "blue")
-            for idx, color in enumerate(colors):
-                ax.plot(self.get_histogram(idx), color=color)
-        else:
-            ax.plot(self.get_histogram(0), color="black")
-        ax.set_title("Histogram")
-        return figure
+        return cv2.calcHist([self.data], [channel], None, [256], [0, 256]).ravel().astype(np.int64)
+
+    def get_histograms(self) -> np.ndarray:
+        return np.stack([self.get_histogram(channel) for channel in range(self.num_channels)])
+
+    def create_histogram_figure(self) -> Figure:
+        return create_histogram_figure(self.get_histograms())
+
+    def apply_lut(self, lut: np.ndarray) -> None:
+        self._set_output(cv2.LUT(self.data, lut, self._output()))
 
     def set_brightness(self, brightness: int) -> None:
-        if brightness > 0:
-            array = np.full(self.data.shape, brightness, dtype=np.uint8)
-            cv2.add(self.data, array, self.data)
-        else:
-            array = np.full(self.data.shape, -brightness, dtype=np.uint8)
-            cv2.subtract(self.data, array, self.data)
+        self.apply_lut(brightness_lut(brightness))
 
     def set_contrast(self, contrast: int) -> None:
-        data = self.data.astype(np.int16)
-        if contrast >= 0:
-            factor = (259 * (contrast + 255)) / (255 * (259 - contrast))
-        else:
-            factor = (259 * (contrast + 255)) / (255 * (259 + contrast))
-        self.data = np.clip((factor * (data - 128) + 128), 0, 255).astype(np.uint8)
+        self.apply_lut(contrast_lut(contrast))
 
     @staticmethod
     def _run_for_valid_kernel_size(func):
+        @functools.wraps(func)
         def wrapper(self, size: int, *args) -> None:
-            size = size if size % 2 == 1 and size > 1 else max(3, size + 1)
-            func(self, size, *args)
+            func(self, valid_kernel_size(size), *args)
         return wrapper
 
     @_run_for_valid_kernel_size
     def average_filter(self, size: int) -> None:
-        cv2.blur(self.data, (size, size), self.data)
+        self._set_output(cv2.blur(self.data, (size, size), self._output()))
 
     @_run_for_valid_kernel_size
     def gaussian_blur(self, size: int) -> None:
+        if size >= GAUSSIAN_PYRAMID_MIN_SIZE:
+            self._set_output(pyramid_gaussian_blur(self.data, size, self._output()))
+            return
         sigma = size / 6
-        cv2.GaussianBlur(self.data, (size, size), sigma, self.data, sigma)
+        self._set_output(cv2.GaussianBlur(self.data, (size, size), sigma, self._output(), sigma))
+
+    def apply_linear(self, linear: LinearFilter) -> None:
+        if len(linear.ops) == 1:
+            method, value = linear.ops[0]
+            method(self, value)
+            return
+        kernel = linear.kernel.astype(np.float32)
+        self._set_output(cv2.sepFilter2D(self.data, -1, kernel, kernel, self._output()))
 
     @_run_for_valid_kernel_size
     def median_filter(self, size: int) -> None:
-        cv2.medianBlur(self.data, size, self.data)
+        self._set_output(cv2.medianBlur(self.data, size, self._output()))
 
     def sharpen(self, size: int) -> None:
-        center = size
-        other = -(size - 1) / 4
-        kernel = np.array(
-            [[0, other, 0],
-            [other, center, other],
-            [0, other, 0]]
-        )
-        cv2.filter2D(self.data, -1, kernel, self.data)
+        if size == 1:
+            return
+        self._set_output(cv2.filter2D(self.data, -1, sharpen_kernel(size), self._output()))
 
-    def rotate(self, angle: int) -> None:
+    def transform(self, matrix: np.ndarray) -> None:
         height, width = self.data.shape[:2]
-        center_x, center_y = width // 2, height // 2
-        rotation_matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, 1)
-        cosine_rot_matrix = np.abs(rotation_matrix[0, 0])
-        sine_rot_matrix = np.abs(rotation_matrix[0, 1])
-        new_width = int((height * sine_rot_matrix) + (width * cosine_rot_matrix))
-        new_height = int((height * cosine_rot_matrix) + (width * sine_rot_matrix))
-        rotation_matrix[0, 2] += (new_width / 2) - center_x
-        rotation_matrix[1, 2] += (new_height / 2) - center_y
-        self.data = cv2.warpAffine(self.data, rotation_matrix, (new_width, new_height))
+        key = tuple(map(tuple, matrix.astype(int))) if np.array_equal(matrix, np.round(matrix)) else None
+        if key in _EXACT_TRANSFORMS:
+            exact = _EXACT_TRANSFORMS[key]
+            if exact is not None:
+                shape = self.data.shape if key[0][0] else (width, height) + self.data.shape[2:]
+                dst = buffer_pool.acquire(shape, self.data.dtype)
+                self._set_output(exact(self.data, dst))
+            return
+        center = np.array([width - 1, height - 1]) / 2
+        new_width = int(height * np.abs(matrix[0, 1]) + width * np.abs(matrix[0, 0]))
+        new_height = int(height * np.abs(matrix[1, 1]) + width * np.abs(matrix[1, 0]))
+        offset = np.array([new_width - 1, new_height - 1]) / 2 - matrix @ center
+        affine = np.hstack([matrix, offset[:, None]])
+        dst = buffer_pool.acquire((new_height, new_width) + self.data.shape[2:], self.data.dtype)
+        self._set_output(cv2.warpAffine(self.data, affine, (new_width, new_height), dst))
+
+    def rotate(self, angle: int) -> None:
+        self.transform(rotation_matrix(angle))
 
     def flip_vertically(self) -> None:
-        cv2.flip(self.data, 0, self.data)
+        self._set_output(cv2.flip(self.data, 0, self._output()))
 
     def flip_horizontally(self) -> None:
-        cv2.flip(self.data, 1, self.data)
\ No newline at end of file
+        self._set_output(cv2.flip(self.data, 1, self._output()))
+
+
+def box_filter(size: int) -> LinearFilter:
+    valid = valid_kernel_size(size)
+    return LinearFilter(np.full(valid, 1 / valid), [(Image.average_filter, size)], LINEAR_PASS_COST + 1)
+
+
+def gaussian_filter(size: int) -> LinearFilter:
+    valid = valid_kernel_size(size)
+    if valid >= GAUSSIAN_PYRAMID_MIN_SIZE:
+        return LinearFilter(None, [(Image.gaussian_blur, size)], LINEAR_PASS_COST + 1)
+    kernel = cv2.getGaussianKernel(valid, valid / 6, cv2.CV_64F).ravel()
+    return LinearFilter(kernel, [(Image.gaussian_blur, size)], LINEAR_PASS_COST + valid)
+
+
+def compose_filters(first: LinearFilter, second: LinearFilter) -> Union[LinearFilter, None]:
+    if first.kernel is None or second.kernel is None:
+        return None
+    kernel = np.convolve(first.kernel, second.kernel)
+    cost = LINEAR_PASS_COST + len(kernel)
+    if cost >= first.cost + second.cost:
+        return None
+    return LinearFilter(kernel, first.ops + second.ops, cost)
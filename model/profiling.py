@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Union
+
+_DISABLED = nullcontext()
+
+
+class OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.wall_max = 0.0
+        self.cpu = 0.0
+        self.peak_bytes = 0
+
+    def add(self, wall: float, cpu: float, peak_bytes: int) -> None:
+        self.count += 1
+        self.wall += wall
+        self.wall_max = max(self.wall_max, wall)
+        self.cpu += cpu
+        self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "wall": self.wall,
+            "wall_mean": self.wall / self.count if self.count else 0.0,
+            "wall_max": self.wall_max,
+            "cpu": self.cpu,
+            "peak_bytes": self.peak_bytes
+        }
+
+
+class Profiler:
+    def __init__(self, max_events: int = 100000):
+        self.enabled = False
+        self.track_memory = False
+        self.trace_path = None
+        self._stats = {}
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+
+    def enable(self, track_memory: bool = False, trace_path: Union[str, None] = None) -> None:
+        self.track_memory = track_memory
+        self.trace_path = trace_path
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self.trace_path:
+            self.write_trace(self.trace_path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._events.clear()
+
+    def measure(self, category: str, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(category, name)
+
+    def task(self, func: Callable) -> Callable:
+        """Wrap func for a worker thread so its CPU time counts towards the caller's open measure."""
+        stack = getattr(self._local, "stack", None) if self.enabled else None
+        if not stack:
+            return func
+        frame = stack[-1]
+
+        def run(*args, **kwargs):
+            start = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    frame[2] += time.thread_time() - start
+        return run
+
+    @contextmanager
+    def _measure(self, category: str, name: str):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = [0, 0, 0.0]
+        track_memory = self.track_memory and tracemalloc.is_tracing()
+        if track_memory:
+            # tracemalloc's peak is process-wide, so it is only exact while one thread is being measured
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            frame[0] = frame[1] = current
+        stack.append(frame)
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            peak_bytes = 0
+            if track_memory:
+                frame[1] = max(frame[1], tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+                peak_bytes = frame[1] - frame[0]
+            stack.pop()
+            with self._lock:
+                cpu = time.thread_time() - start_cpu + frame[2]
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], frame[1])
+                    stack[-1][2] += frame[2]
+            self._record(category, name, start_wall, wall, cpu, peak_bytes)
+
+    def _record(self, category: str, name: str, start: float, wall: float, cpu: float, peak_bytes: int) -> None:
+        key = f"{category}:{name}"
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": wall * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"cpu_ms": cpu * 1e3, "peak_bytes": peak_bytes}
+        }
+        with self._lock:
+            self._stats.setdefault(key, OperationStats()).add(wall, cpu, peak_bytes)
+            self._events.append(event)
+
+    def stats(self, category: Union[str, None] = None) -> Dict[str, dict]:
+        with self._lock:
+            return {key: stats.as_dict() for key, stats in self._stats.items()
+                    if category is None or key.startswith(f"{category}:")}
+
+    def summary(self) -> str:
+        lines = [f"{'operation':<40}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}{'cpu ms':>10}{'peak MB':>10}"]
+        for key, stats in sorted(self.stats().items(), key=lambda item: -item[1]["wall"]):
+            lines.append(f"{key:<40}{stats['count']:>8}{stats['wall'] * 1e3:>12.1f}{stats['wall_mean'] * 1e3:>10.2f}"
+                         f"{stats['wall_max'] * 1e3:>10.2f}{stats['cpu'] * 1e3:>10.1f}{stats['peak_bytes'] / 2 ** 20:>10.1f}")
+        return "\n".join(lines)
+
+    def write_trace(self, path: str) -> None:
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+profiler = Profiler()
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from typing import Any, List, Tuple
+
+from model.processing import Image
+
+RECIPE_VERSION = 1
+
+
+def make_recipe(edits: List[dict]) -> dict:
+    return {"version": RECIPE_VERSION, "edits": list(edits)}
+
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def normalize_recipe(recipe: dict) -> dict:
+    edits = []
+    for edit in recipe["edits"]:
+        if edit["op"] == "accept":
+            edits.append({"op": "accept"})
+            continue
+        edits.append({"op": edit["op"], "value": _normalize_value(edit.get("value"))})
+    return make_recipe(edits)
+
+
+def recipe_hash(recipe: dict) -> str:
+    text = json.dumps(normalize_recipe(recipe), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_recipe(path: str) -> dict:
+    with open(path) as f:
+        recipe = json.load(f)
+    if recipe.get("version") != RECIPE_VERSION or not isinstance(recipe.get("edits"), list):
+        raise ValueError(f"{path} is not a version {RECIPE_VERSION} edit recipe")
+    return recipe
+
+
+def save_recipe(recipe: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(recipe, f, indent=2)
+
+
+def render_recipe(image: Image, recipe: dict) -> Image:
+    from model.model import Model
+    model = Model()
+    model.set_image(image)
+    model.apply_recipe(recipe)
+    return model.get_image()
+
+
+def recipe_steps(recipe: dict) -> List[Tuple[str, Any]]:
+    from model.model import Model
+    model = Model()
+    model.apply_recipe(recipe)
+    return model.get_steps()
+
+
+def apply_steps(target: Any, steps: List[Tuple[str, Any]]) -> None:
+    for name, value in steps:
+        method = getattr(target, name)
+        if value is not None:
+            method(value)
+        else:
+            method()
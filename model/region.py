@@ -0,0 +1,74 @@
+from typing import Any, Callable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from model.processing import Image
+from model.tiling import HALOS, TRANSFORMS, Bounds, supports_tiling
+
+Step = Tuple[Callable, Any]
+
+
+def transformed_shape(shape: Tuple[int, int], matrix: np.ndarray) -> Tuple[int, int]:
+    height, width = shape
+    return (int(height * abs(matrix[1, 1]) + width * abs(matrix[1, 0])),
+            int(height * abs(matrix[0, 1]) + width * abs(matrix[0, 0])))
+
+
+def transform_bounds(bounds: Bounds, matrix: np.ndarray, shape: Tuple[int, int]) -> Bounds:
+    y0, y1, x0, x1 = bounds
+    height, width = shape
+    new_height, new_width = transformed_shape(shape, matrix)
+    center = np.array([width - 1, height - 1]) / 2
+    new_center = np.array([new_width - 1, new_height - 1]) / 2
+    corners = np.array([[x0, x1 - 1], [y0, y1 - 1]], dtype=float)
+    mapped = np.round(matrix @ (corners - center[:, None]) + new_center[:, None]).astype(int)
+    left, top = mapped.min(axis=1)
+    right, bottom = mapped.max(axis=1) + 1
+    return int(top), int(bottom), int(left), int(right)
+
+
+def output_shape(shape: Tuple[int, int], steps: Sequence[Step]) -> Tuple[int, int]:
+    for method, value in steps:
+        if method in TRANSFORMS:
+            shape = transformed_shape(shape, TRANSFORMS[method](value))
+    return shape
+
+
+def plan_region(shape: Tuple[int, int], steps: Sequence[Step], bounds: Bounds) -> Union[List[Bounds], None]:
+    shapes = [shape]
+    for method, value in steps:
+        if not supports_tiling(method, value):
+            return None
+        shapes.append(output_shape(shapes[-1], [(method, value)]))
+    regions = [bounds]
+    for (method, value), in_shape, out_shape in zip(reversed(steps), reversed(shapes[:-1]), reversed(shapes[1:])):
+        y0, y1, x0, x1 = regions[0]
+        if method in TRANSFORMS:
+            regions.insert(0, transform_bounds(regions[0], TRANSFORMS[method](value).T, out_shape))
+            continue
+        halo, alignment = HALOS[method](value)
+        height, width = in_shape
+        regions.insert(0, (max(0, y0 - halo) // alignment * alignment, min(height, y1 + halo),
+                           max(0, x0 - halo) // alignment * alignment, min(width, x1 + halo)))
+    return regions
+
+
+def render_region(image: Image, steps: Sequence[Step], bounds: Bounds) -> Union[Image, None]:
+    shape = image.data.shape[:2]
+    regions = plan_region(shape, steps, bounds)
+    if regions is None:
+        return None
+    y0, y1, x0, x1 = regions[0]
+    tile = Image(image.data[y0:y1, x0:x1], copy=False)
+    for (method, value), current, needed in zip(steps, regions, regions[1:]):
+        if value is not None:
+            method(tile, value)
+        else:
+            method(tile)
+        if method in TRANSFORMS:
+            current = transform_bounds(current, TRANSFORMS[method](value), shape)
+        shape = output_shape(shape, [(method, value)])
+        y0, y1, x0, x1 = needed
+        top, left = current[0], current[2]
+        tile = Image(tile.data[y0 - top:y1 - top, x0 - left:x1 - left], copy=False)
+    return tile
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from model.processing import Image
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, source_hash: str, recipe_hash: str) -> Path:
+        return self.directory / source_hash[:2] / f"{source_hash}-{recipe_hash}.npy"
+
+    def get(self, source_hash: str, recipe_hash: str) -> Union[Image, None]:
+        path = self._path(source_hash, recipe_hash)
+        try:
+            return Image(np.load(path), copy=False)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, source_hash: str, recipe_hash: str, image: Image) -> None:
+        path = self._path(source_hash, recipe_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".npy")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(image.data))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
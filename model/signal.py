@@ -1,9 +1,16 @@
+import threading
+from contextlib import contextmanager
 from typing import Callable
 
+from model.profiling import profiler
+
 
 class Signal:
     def __init__(self):
         self._callbacks = []
+        self._held = 0
+        self._pending = None
+        self._lock = threading.RLock()
 
     def connect(self, callback: Callable) -> None:
         self._callbacks.append(callback)
@@ -11,6 +18,29 @@ class Signal:
     def disconnect(self, callback: Callable) -> None:
         self._callbacks.remove(callback)
 
+    @contextmanager
+    def coalesce(self):
+        with self._lock:
+            self._held += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held -= 1
+                pending = self._pending if self._held == 0 else None
+                if pending is not None:
+                    self._pending = None
+            if pending is not None:
+                self._fire(*pending)
+
     def emit(self, *args, **kwargs):
-        for callback in self._callbacks:
-            callback(*args, **kwargs)
\ No newline at end of file
+        with self._lock:
+            if self._held:
+                self._pending = (args, kwargs)
+                return
+        self._fire(args, kwargs)
+
+    def _fire(self, args: tuple, kwargs: dict) -> None:
+        for callback in list(self._callbacks):
+            with profiler.measure("signal", getattr(callback, "__qualname__", repr(callback))):
+                callback(*args, **kwargs)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, Union
+
+import cv2
+import numpy as np
+
+from model.processing import (Image, LinearFilter, brightness_lut, contrast_lut, read_rgb, rotation_matrix,
+                              FLIP_HORIZONTALLY, FLIP_VERTICALLY)
+from model.profiling import profiler
+from model.recipe import apply_steps, recipe_steps
+
+_STACK_TRANSFORMS = {
+    ((1, 0), (0, 1)): None,
+    ((-1, 0), (0, 1)): lambda data: data[:, :, ::-1],
+    ((1, 0), (0, -1)): lambda data: data[:, ::-1],
+    ((-1, 0), (0, -1)): lambda data: data[:, ::-1, ::-1],
+    ((0, 1), (-1, 0)): lambda data: np.rot90(data, 1, axes=(1, 2)),
+    ((0, -1), (1, 0)): lambda data: np.rot90(data, -1, axes=(1, 2)),
+    ((0, 1), (1, 0)): lambda data: data.swapaxes(1, 2),
+    ((0, -1), (-1, 0)): lambda data: data.swapaxes(1, 2)[:, ::-1, ::-1],
+}
+
+
+class ImageStack:
+    def __init__(self, data: np.ndarray, copy: bool = True, workers: Union[int, None] = None) -> None:
+        if data.ndim != 4:
+            raise ValueError(f"expected (N, H, W, C) data, got shape {data.shape}")
+        self.data = np.array(data, copy=True) if copy else data
+        self.workers = max(1, workers or os.cpu_count() or 1)
+
+    @classmethod
+    def from_images(cls, images: Sequence[Image], workers: Union[int, None] = None) -> ImageStack:
+        return cls(np.stack([image.data for image in images]), copy=False, workers=workers)
+
+    @classmethod
+    def open(cls, image_paths: Sequence[str], workers: Union[int, None] = None) -> ImageStack:
+        with ThreadPoolExecutor(max_workers=max(1, workers or os.cpu_count() or 1)) as pool:
+            frames = list(pool.map(read_rgb, image_paths))
+        return cls(np.stack(frames), copy=False, workers=workers)
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __getitem__(self, index: int) -> Image:
+        return Image(self.data[index], copy=False)
+
+    def frames(self) -> List[Image]:
+        return [self[index] for index in range(len(self))]
+
+    @property
+    def num_channels(self) -> int:
+        return self.data.shape[3]
+
+    def _rows(self) -> np.ndarray:
+        count, height, width, channels = self.data.shape
+        return np.ascontiguousarray(self.data).reshape(count * height, width, channels)
+
+    def _per_frame(self, method: Callable, *args) -> None:
+        def run(frame: np.ndarray) -> np.ndarray:
+            image = Image(frame, copy=False)
+            method(image, *args)
+            return image.data
+
+        with profiler.measure("stack", method.__name__):
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(self))) as pool:
+                self.data = np.stack(list(pool.map(profiler.task(run), self.data)))
+
+    def get_histograms(self) -> np.ndarray:
+        return np.stack([frame.get_histograms() for frame in self.frames()])
+
+    def apply_lut(self, lut: np.ndarray) -> None:
+        with profiler.measure("stack", "apply_lut"):
+            self.data = cv2.LUT(self._rows(), lut).reshape(self.data.shape)
+
+    def set_brightness(self, brightness: int) -> None:
+        self.apply_lut(brightness_lut(brightness))
+
+    def set_contrast(self, contrast: int) -> None:
+        self.apply_lut(contrast_lut(contrast))
+
+    def apply_linear(self, linear: LinearFilter) -> None:
+        self._per_frame(Image.apply_linear, linear)
+
+    def average_filter(self, size: int) -> None:
+        self._per_frame(Image.average_filter, size)
+
+    def gaussian_blur(self, size: int) -> None:
+        self._per_frame(Image.gaussian_blur, size)
+
+    def median_filter(self, size: int) -> None:
+        self._per_frame(Image.median_filter, size)
+
+    def sharpen(self, size: int) -> None:
+        self._per_frame(Image.sharpen, size)
+
+    def transform(self, matrix: np.ndarray) -> None:
+        key = tuple(map(tuple, matrix.astype(int))) if np.array_equal(matrix, np.round(matrix)) else None
+        if key not in _STACK_TRANSFORMS:
+            self._per_frame(Image.transform, matrix)
+            return
+        exact = _STACK_TRANSFORMS[key]
+        if exact is not None:
+            with profiler.measure("stack", "transform"):
+                self.data = np.ascontiguousarray(exact(self.data))
+
+    def rotate(self, angle: int) -> None:
+        self.transform(rotation_matrix(angle))
+
+    def flip_vertically(self) -> None:
+        self.transform(FLIP_VERTICALLY)
+
+    def flip_horizontally(self) -> None:
+        self.transform(FLIP_HORIZONTALLY)
+
+
+def render_stack(stack: ImageStack, recipe: dict) -> ImageStack:
+    result = ImageStack(stack.data, workers=stack.workers)
+    apply_steps(result, recipe_steps(recipe))
+    return result
@@ -0,0 +1,257 @@
+import argparse
+import glob
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Sequence, Union
+
+import cv2
+import numpy as np
+
+from model.batch import parse_edit
+from model.processing import Image, read_rgb
+from model.profiling import profiler
+from model.recipe import apply_steps, load_recipe, make_recipe, recipe_steps
+
+VIDEO_CODECS = {".avi": "MJPG", ".mp4": "mp4v", ".mkv": "MJPG", ".mov": "mp4v"}
+DEFAULT_FPS = 25.0
+SEQUENCE_START_RANGE = 5  # first indices probed for a printf pattern, like ffmpeg's start_number_range
+
+_END = object()
+
+
+class StreamStats:
+    def __init__(self):
+        self.frames = 0
+        self.seconds = 0.0
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+
+def is_sequence(source: Union[str, Sequence[str]]) -> bool:
+    return not isinstance(source, str) or os.path.isdir(source) or "%" in source or glob.has_magic(source)
+
+
+def sequence_paths(source: Union[str, Sequence[str]]) -> List[str]:
+    if not isinstance(source, str):
+        return list(source)
+    if os.path.isdir(source):
+        return sorted(str(path) for path in Path(source).iterdir() if path.is_file())
+    if "%" in source:
+        first = next((idx for idx in range(SEQUENCE_START_RANGE) if os.path.exists(source % idx)), 0)
+        paths = []
+        while os.path.exists(source % (first + len(paths))):
+            paths.append(source % (first + len(paths)))
+        return paths
+    return sorted(glob.glob(source))
+
+
+def source_fps(source: Union[str, Sequence[str]]) -> float:
+    if is_sequence(source):
+        return DEFAULT_FPS
+    capture = cv2.VideoCapture(source)
+    try:
+        return capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    finally:
+        capture.release()
+
+
+def read_frames(source: Union[str, Sequence[str]]) -> Iterator[np.ndarray]:
+    if is_sequence(source):
+        for path in sequence_paths(source):
+            yield read_rgb(path)
+        return
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise IOError(f"could not open video {source}")
+    try:
+        while True:
+            with profiler.measure("decode", "video"):
+                ok, frame = capture.read()
+            if not ok:
+                return
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, frame)
+    finally:
+        capture.release()
+
+
+def prefetch(frames: Iterable[np.ndarray], size: int) -> Iterator[np.ndarray]:
+    buffer = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+    errors = []
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def decode() -> None:
+        try:
+            for frame in frames:
+                if not put(frame):
+                    return
+        except Exception as error:
+            errors.append(error)
+        put(_END)
+
+    thread = threading.Thread(target=decode, name="StreamDecode", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def process_frames(frames: Iterable[np.ndarray], render: Callable[[Image], Image], workers: Union[int, None] = None,
+                   prefetch_size: int = 8) -> Iterator[Image]:
+    workers = max(1, workers or os.cpu_count() or 1)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="StreamWorker") as pool:
+        try:
+            for frame in prefetch(frames, prefetch_size):
+                pending.append(pool.submit(render, Image(frame, copy=False)))
+                if len(pending) >= workers + prefetch_size:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class SequenceWriter:
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.count = 0
+
+    def write(self, image: Image) -> None:
+        path = self.pattern % self.count
+        if self.count == 0:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        image.save(path)
+        self.count += 1
+
+    def release(self) -> None:
+        pass
+
+
+class VideoWriter:
+    def __init__(self, path: str, fps: float, codec: Union[str, None] = None):
+        self.path = path
+        self.fps = fps
+        self.codec = codec or VIDEO_CODECS.get(Path(path).suffix.lower(), "MJPG")
+        self._writer = None
+
+    def write(self, image: Image) -> None:
+        data = image.data
+        if self._writer is None:
+            height, width = data.shape[:2]
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.codec), self.fps, (width, height),
+                                           data.ndim == 3 and data.shape[2] == 3)
+            if not self._writer.isOpened():
+                raise IOError(f"could not open {self.path} for writing")
+        with profiler.measure("encode", "video"):
+            self._writer.write(cv2.cvtColor(data, cv2.COLOR_RGB2BGR) if data.ndim == 3 and data.shape[2] == 3 else data)
+
+    def release(self) -> None:
+        if self._writer is not None:
+            self._writer.release()
+
+
+def open_writer(output: str, fps: float, codec: Union[str, None] = None) -> Union[SequenceWriter, VideoWriter]:
+    if "%" in output:
+        return SequenceWriter(output)
+    return VideoWriter(output, fps, codec)
+
+
+def frame_renderer(recipe: dict) -> Callable[[Image], Image]:
+    steps = recipe_steps(recipe)
+
+    def render(image: Image) -> Image:
+        with profiler.measure("stream", "render"):
+            apply_steps(image, steps)
+        return image
+    return render
+
+
+def render_stream(source: Union[str, Sequence[str]], output: str, recipe: dict, workers: Union[int, None] = None,
+                  prefetch_size: int = 8, fps: Union[float, None] = None, codec: Union[str, None] = None,
+                  on_progress: Union[Callable[[StreamStats], None], None] = None) -> StreamStats:
+    stats = StreamStats()
+    writer = open_writer(output, fps or source_fps(source), codec)
+    start = time.perf_counter()
+    try:
+        for image in process_frames(read_frames(source), frame_renderer(recipe), workers, prefetch_size):
+            writer.write(image)
+            stats.frames += 1
+            stats.seconds = time.perf_counter() - start
+            if on_progress is not None:
+                on_progress(stats)
+    finally:
+        writer.release()
+    if stats.frames == 0:
+        raise ValueError(f"no frames could be read from {source}")
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def format_stats(stats: StreamStats) -> str:
+    return f"{stats.frames} frames in {stats.seconds:.2f}s ({stats.fps:.1f} fps)"
+
+
+def main(argv: Union[Sequence[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m model.stream",
+        description="Apply the same edits to every frame of a video or numbered image sequence.")
+    parser.add_argument("source", help="video file, directory, glob or printf pattern such as frames/%%05d.png")
+    parser.add_argument("output", help="video file, or printf pattern for an image sequence")
+    parser.add_argument("-e", "--edit", dest="edits", action="append", type=parse_edit, default=[],
+                        metavar="NAME[=VALUE]", help="edit to apply, in order (e.g. brightness=20, rotate=90)")
+    parser.add_argument("-r", "--recipe", type=Path, default=None,
+                        help="JSON edit recipe to apply before any --edit options")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker threads (default: CPU count)")
+    parser.add_argument("--prefetch", type=int, default=8, help="number of decoded frames buffered ahead (default: 8)")
+    parser.add_argument("--fps", type=float, default=None, help="output frame rate (default: the source's)")
+    parser.add_argument("--codec", default=None, help="FourCC of the output video codec, e.g. MJPG")
+    args = parser.parse_args(argv)
+
+    try:
+        edits = load_recipe(str(args.recipe))["edits"] if args.recipe else []
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    recipe = make_recipe(edits + [{"op": name, "value": value} for name, value in args.edits])
+
+    def report(stats: StreamStats) -> None:
+        print(f"\r{format_stats(stats)}", end="", file=sys.stderr)
+
+    try:
+        stats = render_stream(args.source, args.output, recipe, max(1, args.jobs), max(1, args.prefetch), args.fps,
+                              args.codec, report)
+    except (OSError, ValueError) as error:
+        print(f"\nerror: {error}", file=sys.stderr)
+        return 1
+    print(f"\r{format_stats(stats)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+from model import batch
+from model.processing import Image
+
+
+class TestBatch:
+    @pytest.fixture
+    def tree(self, tmp_path, synthetic_image):
+        src = tmp_path / "in"
+        (src / "nested").mkdir(parents=True)
+        for seed, name in enumerate(("a.png", "nested/b.png", "nested/c.bmp")):
+            synthetic_image((20, 30, 3), name=f"in/{name}", seed=seed)
+        (src / "notes.txt").write_text("not an image")
+        return src, tmp_path / "out"
+
+    def test_renders_tree(self, tree, capsys):
+        src, out = tree
+        assert batch.main([str(src), str(out), "-j", "2", "-e", "brightness=20", "-e", "rotate=90"]) == 0
+        assert "3 rendered, 0 up to date, 0 failed" in capsys.readouterr().out
+        expected = Image.open(str(src / "nested/b.png"))
+        expected.set_brightness(20)
+        expected.rotate(90)
+        assert np.array_equal(Image.open(str(out / "nested/b.png")).data, expected.data)
+        assert not (out / "notes.txt").exists()
+
+    def test_resumes_and_isolates_errors(self, tree, capsys):
+        src, out = tree
+        batch.main([str(src), str(out), "-j", "1", "--format", "png"])
+        assert (out / "nested/c.png").exists()
+        (src / "broken.jpg").write_bytes(b"garbage")
+        future = os.stat(src / "a.png").st_mtime + 10
+        os.utime(src / "a.png", (future, future))
+        assert batch.main([str(src), str(out), "-j", "2", "--format", "png"]) == 1
+        output = capsys.readouterr()
+        assert "1 rendered, 2 up to date, 1 failed" in output.out
+        assert "broken.jpg" in output.err
+
+    def test_changed_edits_rerender(self, tree, capsys):
+        src, out = tree
+        assert batch.main([str(src), str(out), "-j", "1", "-e", "brightness=20"]) == 0
+        assert batch.main([str(src), str(out), "-j", "1", "-e", "brightness=20"]) == 0
+        assert "0 rendered, 3 up to date" in capsys.readouterr().out
+        assert batch.main([str(src), str(out), "-j", "1", "-e", "brightness=40"]) == 0
+        assert "3 rendered, 0 up to date" in capsys.readouterr().out
+        expected = Image.open(str(src / "a.png"))
+        expected.set_brightness(40)
+        assert np.array_equal(Image.open(str(out / "a.png")).data, expected.data)
+
+    def test_repeated_edits_run_in_order(self, tree, capsys):
+        src, out = tree
+        assert batch.main([str(src), str(out), "-j", "1", "-e", "brightness=10", "-e", "brightness=20"]) == 0
+        expected = Image.open(str(src / "a.png"))
+        expected.set_brightness(10)
+        expected.set_brightness(20)
+        assert np.array_equal(Image.open(str(out / "a.png")).data, expected.data)
+        assert batch.main([str(src), str(out), "-j", "1", "-e", "brightness=20"]) == 0
+        assert "3 rendered, 0 up to date" in capsys.readouterr().out.splitlines()[-1]
+
+    def test_rejects_unknown_edit(self, tree):
+        with pytest.raises(SystemExit):
+            batch.main([str(tree[0]), str(tree[1]), "-e", "posterize=4"])
+
+    def test_recipe_and_render_cache(self, tree, tmp_path, capsys):
+        src, out = tree
+        recipe = tmp_path / "recipe.json"
+        recipe.write_text('{"version": 1, "edits": [{"op": "contrast", "value": 30}]}')
+        cache = tmp_path / "cache"
+        args = [str(src), str(out), "-j", "1", "-r", str(recipe), "-e", "flip_vertically", "--cache-dir", str(cache)]
+        assert batch.main(args) == 0
+        assert len(list(cache.rglob("*.npy"))) == 3
+        assert batch.main(args + ["--force"]) == 0
+        assert "3 rendered" in capsys.readouterr().out
+        expected = Image.open(str(src / "a.png"))
+        expected.set_contrast(30)
+        expected.flip_vertically()
+        assert np.array_equal(Image.open(str(out / "a.png")).data, expected.data)
@@ -0,0 +1,100 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from model import decode_cache as decode_cache_module
+from model.decode_cache import DecodeCache
+from model.model import Model
+from model.processing import Image, read_rgb
+from model.render_cache import file_digest
+
+
+@pytest.fixture
+def path(synthetic_image):
+    return synthetic_image((60, 80, 3), name="source.png")
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(decode_cache_module, "read_rgb", lambda *args: calls.append(args) or read_rgb(*args))
+    return calls
+
+
+class TestDecodeCache:
+    def test_hit_is_memory_mapped(self, path, tmp_path, decodes):
+        cache = DecodeCache(str(tmp_path / "cache"))
+        first = cache.load(path)
+        second = cache.load(path)
+        assert len(decodes) == 1
+        assert isinstance(second, np.memmap) and not second.flags.writeable
+        assert np.array_equal(first, read_rgb(path))
+        assert np.array_equal(second, first)
+
+    def test_reductions_are_cached_separately(self, path, tmp_path, decodes, monkeypatch):
+        digests = []
+        monkeypatch.setattr(decode_cache_module, "file_digest",
+                            lambda *args: digests.append(args) or file_digest(*args))
+        cache = DecodeCache(str(tmp_path / "cache"))
+        assert cache.get(path) is None
+        assert cache.load(path, 2).shape == (30, 40, 3)
+        assert cache.load(path).shape == (60, 80, 3)
+        assert len(decodes) == 2
+        assert len(digests) == 1
+
+    def test_modified_source_is_decoded_again(self, path, tmp_path, decodes):
+        cache = DecodeCache(str(tmp_path / "cache"))
+        cache.load(path)
+        cv2.imwrite(path, np.zeros((60, 80, 3), dtype=np.uint8))
+        os.utime(path, ns=(0, 10 ** 18))
+        assert cache.load(path).max() == 0
+        assert len(decodes) == 2
+
+    def test_identical_content_is_shared(self, path, tmp_path, decodes):
+        copy = str(tmp_path / "copy.png")
+        with open(path, "rb") as src, open(copy, "wb") as dst:
+            dst.write(src.read())
+        cache = DecodeCache(str(tmp_path / "cache"))
+        cache.load(path)
+        cache.load(copy)
+        assert len(decodes) == 1
+
+    def test_lru_eviction(self, tmp_path, decodes):
+        entry = 60 * 80 * 3 + 128
+        cache = DecodeCache(str(tmp_path / "cache"), max_bytes=2 * entry)
+        paths = []
+        for idx in range(3):
+            paths.append(str(tmp_path / f"{idx}.png"))
+            cv2.imwrite(paths[-1], np.full((60, 80, 3), idx, dtype=np.uint8))
+        cache.load(paths[0])
+        cache.load(paths[1])
+        os.utime(cache._data_path(cache._digest(cache._ref_path(paths[1]), paths[1]), 1), (0, 0))
+        cache.load(paths[0])
+        cache.load(paths[2])
+        assert cache.size() <= 2 * entry
+        assert cache.get(paths[0]) is not None
+        assert cache.get(paths[1]) is None
+        assert cache.get(paths[2]) is not None
+
+    def test_cached_image_is_copy_on_write(self, path, tmp_path):
+        cache = DecodeCache(str(tmp_path / "cache"))
+        cache.load(path)
+        image = Image.open(path, cache=cache)
+        original = np.array(image.data)
+        image.set_brightness(40)
+        image.flip_horizontally()
+        assert np.array_equal(Image.open(path, cache=cache).data, original)
+
+    def test_model_uses_cache(self, path, tmp_path, decodes):
+        model = Model(decode_cache=DecodeCache(str(tmp_path / "cache")))
+        model.open_file(path)
+        model.set_attribute("brightness", 20)
+        model.open_file(path)
+        model.set_attribute("brightness", 20)
+        assert len(decodes) == 1
+        assert isinstance(model.image.data, np.memmap)
+        expected = Image(read_rgb(path))
+        expected.set_brightness(20)
+        assert np.array_equal(model.get_image().data, expected.data)
@@ -0,0 +1,116 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from model.export import ExportJob, ExportTarget
+from model.model import Model
+from model.processing import Image
+
+
+@pytest.fixture
+def data(synthetic_image):
+    return synthetic_image((12, 16, 3), size=(160, 120))
+
+
+class TestExportTarget:
+    def test_encoder_params(self):
+        assert ExportTarget("a.jpg", quality=80, progressive=True).encoder_params() == [
+            cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+        assert ExportTarget("a.png", compression=1).encoder_params() == [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        assert ExportTarget("a.bmp").encoder_params() == []
+
+    def test_rejects_unsupported_options(self):
+        with pytest.raises(ValueError):
+            ExportTarget("a.png", quality=90)
+        with pytest.raises(ValueError):
+            ExportTarget("a.bmp", progressive=True)
+
+    def test_output_size(self):
+        assert ExportTarget("a.png").output_size(400, 300) == (400, 300)
+        assert ExportTarget("a.png", max_size=100).output_size(400, 300) == (100, 75)
+        assert ExportTarget("a.png", max_size=1000).output_size(400, 300) == (400, 300)
+
+
+class TestExportJob:
+    def test_renders_once_for_all_targets(self, data, tmp_path):
+        renders = []
+        targets = [ExportTarget(tmp_path / "full.png", compression=1),
+                   ExportTarget(tmp_path / "small.jpg", quality=90, max_size=80),
+                   ExportTarget(tmp_path / "thumb.webp", quality=50, max_size=80)]
+        job = ExportJob(lambda: renders.append(1) or Image(data), targets).start()
+        assert job.wait(5)
+        assert renders == [1] and job.error is None and job.progress == 1.0
+        assert job.written == [target.path for target in targets]
+        assert np.array_equal(cv2.cvtColor(cv2.imread(targets[0].path), cv2.COLOR_BGR2RGB), data)
+        assert cv2.imread(targets[1].path).shape == (60, 80, 3)
+
+    def test_quality_controls_size(self, data, tmp_path):
+        paths = [str(tmp_path / "low.jpg"), str(tmp_path / "high.jpg")]
+        job = ExportJob(lambda: Image(data), [ExportTarget(paths[0], quality=20),
+                                               ExportTarget(paths[1], quality=95)]).start()
+        job.wait(5)
+        assert os.path.getsize(paths[0]) < os.path.getsize(paths[1])
+
+    def test_cancel_writes_nothing(self, data, tmp_path):
+        started, release = threading.Event(), threading.Event()
+        finished = []
+        job = ExportJob(lambda: started.set() or release.wait(5) and Image(data),
+                        [ExportTarget(tmp_path / "out.png")], on_finished=finished.append).start()
+        assert started.wait(5)
+        job.cancel()
+        release.set()
+        assert job.wait(5)
+        assert job.cancelled and job.error is None and job.written == []
+        assert finished == [job]
+        assert os.listdir(tmp_path) == []
+
+    def test_errors_are_reported(self, data, tmp_path):
+        job = ExportJob(lambda: Image(data), [ExportTarget(tmp_path / "out.unknown")]).start()
+        assert job.wait(5)
+        assert job.error is not None
+        assert os.listdir(tmp_path) == []
+
+
+class TestModelExport:
+    @pytest.fixture
+    def model(self, data, tmp_path):
+        path = str(tmp_path / "source.png")
+        cv2.imwrite(path, data)
+        model = Model()
+        model.open_file(path)
+        return model
+
+    def test_export_snapshots_edits(self, model, tmp_path):
+        model.set_attribute("rotate", 90)
+        job = model.export([ExportTarget(tmp_path / "out.png")])
+        model.set_attribute("flip_horizontally", None)
+        assert job.wait(5)
+        expected = np.rot90(model.image.data)
+        assert np.array_equal(cv2.cvtColor(cv2.imread(job.written[0]), cv2.COLOR_BGR2RGB), expected)
+
+    def test_save_file_accepts_encoder_options(self, model, tmp_path):
+        model.save_file(str(tmp_path / "out.jpg"), quality=70, progressive=True)
+        assert cv2.imread(str(tmp_path / "out.jpg")).shape == (120, 160, 3)
+        with pytest.raises(Exception):
+            model.save_file(str(tmp_path / "out.unknown"))
+
+    def test_export_needs_an_image(self, tmp_path):
+        with pytest.raises(ValueError):
+            Model().export([ExportTarget(tmp_path / "out.png")])
+
+    @pytest.mark.parametrize("replace", ["open", "clear"])
+    def test_export_fails_when_image_is_replaced(self, model, data, tmp_path, replace):
+        other = str(tmp_path / "other.png")
+        cv2.imwrite(other, data[::-1])
+        model._loaded.clear()
+        job = model.export([ExportTarget(tmp_path / "out.png")])
+        if replace == "open":
+            model.open_file(other)
+        else:
+            model.clear()
+        assert job.wait(5)
+        assert isinstance(job.error, RuntimeError)
+        assert not os.path.exists(tmp_path / "out.png")
@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pytest
+
+from model.history import Base, BaseStore
+from model.model import Model
+from model.processing import Image
+
+
+class TestBaseStore:
+    @pytest.mark.parametrize("shape", [(30, 20, 3), (30, 20, 1)])
+    def test_spill_round_trip(self, tmp_path, shape, synthetic_image):
+        data = synthetic_image(shape)
+        store = BaseStore(data.nbytes, spill_dir=str(tmp_path))
+        first, second = Base(None, ()), Base(None, ())
+        store.put((first, 1.0), Image(data))
+        store.put((second, 1.0), Image(data[::-1]))
+        assert store.is_spilled((first, 1.0)) and store.size <= store.budget
+        assert len(os.listdir(tmp_path)) == 1
+        assert np.array_equal(store.get((first, 1.0)).data, data)
+        assert store.is_spilled((second, 1.0))
+        store.clear()
+        assert os.listdir(tmp_path) == []
+
+    def test_pinned_base_stays_in_memory(self, tmp_path):
+        data = np.zeros((10, 10, 3), dtype=np.uint8)
+        store = BaseStore(0, spill_dir=str(tmp_path))
+        current, older = Base(None, ()), Base(None, ())
+        store.pin(current)
+        store.put((current, 1.0), Image(data))
+        store.put((older, 1.0), Image(data))
+        assert not store.is_spilled((current, 1.0))
+        assert store.is_spilled((older, 1.0))
+
+    def test_retain(self):
+        store = BaseStore(1 << 20)
+        kept, dropped = Base(None, ()), Base(None, ())
+        for base in (kept, dropped):
+            for scale in (1.0, 0.5, 0.25):
+                store.put((base, scale), Image(np.zeros((4, 4, 3), dtype=np.uint8)))
+        store.retain_bases({kept})
+        store.retain_scales((1.0, 0.5))
+        assert (kept, 1.0) in store and (kept, 0.5) in store
+        assert (kept, 0.25) not in store and (dropped, 1.0) not in store
+
+
+class TestHistoryCompaction:
+    @pytest.fixture
+    def path(self, synthetic_image):
+        return synthetic_image((80, 60, 3), name="synthetic.png")
+
+    @pytest.fixture
+    def model(self, path, tmp_path):
+        model = Model(spill_dir=str(tmp_path))
+        model.open_file(path)
+        model.set_viewport_size(30, 30)
+        return model
+
+    def reference(self, path, recipe, preview=True):
+        model = Model()
+        model.open_file(path)
+        model.set_viewport_size(30, 30)
+        model.apply_recipe(recipe)
+        return model.get_data() if preview else model.get_image().data
+
+    def test_replay_covers_only_pending_edits(self, model):
+        calls = []
+
+        def blur(img, value):
+            calls.append(value)
+            img.gaussian_blur(value)
+        model._edit_actions.append((blur, 5, True))
+        model.accept()
+        model.set_attribute("brightness", 20)
+        model.get_data()
+        model._snapshots.clear()
+        model.get_data()
+        model.get_image()
+        assert calls == [5, 5]
+
+    def test_accept_keeps_rendered_result(self, model, path):
+        model.set_attribute("gaussian_blur", 5)
+        model.set_attribute("rotate", 90)
+        before = model.get_data()
+        model.accept()
+        assert model._edit_actions == []
+        assert np.array_equal(model.get_data(), before)
+        model.set_attribute("contrast", 30)
+        model.accept()
+        model.set_attribute("brightness", -20)
+        assert np.array_equal(model.get_data(), self.reference(path, model.get_recipe()))
+        assert np.array_equal(model.get_image().data,
+                              self.reference(path, model.get_recipe(), preview=False))
+
+    def test_cancel_accept_reopens_previous_edits(self, model):
+        model.set_attribute("brightness", 20)
+        model.accept()
+        model.set_attribute("contrast", 40)
+        pending = model.get_data()
+        model.accept()
+        model.set_attribute("sharpen", 3)
+        model.cancel_accept()
+        assert [action[1] for action in model._edit_actions] == [40]
+        assert np.array_equal(model.get_data(), pending)
+        model.cancel()
+        assert [action[1] for action in model._edit_actions] == [40]
+        model.cancel_accept()
+        assert [action[1] for action in model._edit_actions] == [20]
+        assert model._base is None
+
+    def test_undo_stack_sequence(self, model, path):
+        model.set_attribute("brightness", 10)
+        model.set_attribute("brightness", 20)
+        model.accept()
+        model.set_attribute("rotate", 90)
+        model.set_attribute("contrast", 30)
+        model.set_attribute("contrast", 0)
+        model.set_attribute("rotate", -90)
+        model.cancel_accept()
+        model.set_attribute("brightness", 10)
+        expected = self.reference(path, {"version": 1, "edits": [{"op": "brightness", "value": 10}]})
+        assert np.array_equal(model.get_data(), expected)
+        model.set_attribute("brightness", 20)
+        model.accept()
+        model.set_attribute("rotate", 90)
+        expected = self.reference(path, model.get_recipe())
+        assert np.array_equal(model.get_data(), expected)
+
+    def test_old_bases_spill_to_disk(self, path, tmp_path):
+        spill_dir = tmp_path / "spill"
+        spill_dir.mkdir()
+        model = Model(history_budget=0, spill_dir=str(spill_dir))
+        model.open_file(path)
+        for value in (10, 20, 30):
+            model.set_attribute("gaussian_blur", 3)
+            model.set_attribute("brightness", value)
+            model.accept()
+        full = model.get_image().data
+        assert all(key[0] is model._base for key in model._bases._images)
+        assert sum(1 for node in model._chain(model._base)[:-1] if model._bases.is_spilled((node, 1.0))) == 2
+        assert os.listdir(spill_dir)
+        assert np.array_equal(full, self.reference(path, model.get_recipe(), preview=False))
+        model.cancel_accept()
+        model.accept()
+        assert np.array_equal(model.get_image().data, full)
+        model.cancel_accept()
+        model.cancel_accept()
+        assert np.array_equal(model.get_image().data,
+                              self.reference(path, model.get_recipe(), preview=False))
+
+    def test_set_image_starts_a_new_history(self, model):
+        model.set_attribute("gaussian_blur", 5)
+        model.set_attribute("average_filter", 3)
+        model.accept()
+        model.set_attribute("rotate", 90)
+        assert [name for name, _ in model.get_steps()] == ["apply_linear", "transform"]
+        data = np.zeros((8, 6, 3), dtype=np.uint8)
+        model.set_image(Image(data))
+        assert model.get_steps() == [] and model.get_recipe()["edits"] == []
+        assert np.array_equal(model.get_image().data, data)
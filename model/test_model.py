@@ -1,9 +1,16 @@
 
+import cv2
+import threading
+import time
 import pytest
 import numpy as np
 
+from model import model as model_module
+from model.buffers import allocation_stats, buffer_pool
 from model.model import Model
-from model.processing import Image
+from model.processing import (Image, read_rgb, pyramid_error_bound, pyramid_gaussian_blur, sharpen_kernel,
+                              GAUSSIAN_PYRAMID_MIN_SIZE)
+from model.tiling import TiledExecutor
 
 class TestModel:
     @pytest.fixture
@@ -19,7 +26,8 @@ class TestModel:
         assert len(model._edit_actions) == 1
         model.accept()
         assert np.equal(model.image.data, data).all()
-        assert len(model._edit_actions) == 2
+        assert len(model._edit_actions) == 0
+        assert model._base.actions[0][1] == 100
     
     def test_cancel(self, model):
         data = model.image.data
@@ -34,3 +42,545 @@ class TestModel:
         assert np.equal(model.image.data, data).all()
         assert len(model._edit_actions) == 0
 
+
+
+class TestSnapshotCache:
+    @pytest.fixture
+    def model(self, synthetic_image):
+        model = Model()
+        model.open_file(synthetic_image((64, 48, 3), name="synthetic.png"))
+        return model
+
+    def replay_uncached(self, model):
+        img = model.image
+        for method, value, use_last in model._history_actions(model._base, model._edit_actions):
+            if use_last:
+                img = Image(img.data)
+                method(img, value) if value is not None else method(img)
+        return img.data
+
+    def test_replay_matches_uncached(self, model):
+        model.set_attribute("brightness", 30)
+        model.set_attribute("gaussian_blur", 5)
+        model.accept()
+        model.set_attribute("rotate", 90)
+        model.set_attribute("contrast", -20)
+        assert np.array_equal(model.get_data(), self.replay_uncached(model))
+        model.set_attribute("contrast", 40)
+        assert np.array_equal(model.get_data(), self.replay_uncached(model))
+
+    def test_last_action_change_reuses_prefix(self, model):
+        calls = []
+        def blur(img, value):
+            calls.append(value)
+            img.gaussian_blur(value)
+        model.set_attribute("brightness", 30)
+        model._edit_actions.append((blur, 5, True))
+        model.set_attribute("contrast", 10)
+        model.get_data()
+        model.set_attribute("contrast", 20)
+        model.get_data()
+        assert calls == [5]
+
+    def test_invalidation(self, model, tmp_path):
+        model.set_attribute("brightness", 30)
+        model.set_attribute("gaussian_blur", 3)
+        model.get_data()
+        assert len(model._snapshots) == 2
+        model.cancel()
+        assert len(model._snapshots) == 0
+        model.set_attribute("brightness", 30)
+        model.get_data()
+        path = str(tmp_path / "other.png")
+        cv2.imwrite(path, np.zeros((8, 8, 3), dtype=np.uint8))
+        model.open_file(path)
+        assert len(model._snapshots) == 0
+        model.set_attribute("brightness", 30)
+        assert model.get_data().max() == 30
+
+    def test_budget_eviction(self, model):
+        model._snapshots.budget = 2 * model.image.data.nbytes
+        for name in ("gaussian_blur", "rotate", "gaussian_blur", "rotate", "gaussian_blur"):
+            model.set_attribute(name, 90 if name == "rotate" else 3)
+        model.get_data()
+        assert len(model._snapshots) == 2
+        assert model._snapshots.size <= model._snapshots.budget
+
+
+class TestProxyPreview:
+    @pytest.fixture
+    def model(self, synthetic_image):
+        model = Model()
+        model.open_file(synthetic_image((400, 300, 3), name="synthetic.png"))
+        return model
+
+    def test_preview_fits_viewport(self, model):
+        model.set_viewport_size(150, 100)
+        assert model.get_data().shape[:2] == (200, 150)
+        model.set_attribute("rotate", 90)
+        assert model.get_data().shape[:2] == (150, 200)
+        model.set_viewport_size(100, 60)
+        assert model.get_data().shape[:2] == (75, 100)
+        model.set_viewport_size(1000, 1000)
+        assert model.get_data().shape[:2] == (300, 400)
+
+    def test_resize_within_scale_keeps_proxy(self, model):
+        model.set_viewport_size(150, 100)
+        model.set_attribute("brightness", 20)
+        job = model.get_render_job()
+        assert model._proxy is None
+        assert job().shape[:2] == (200, 150)
+        proxy = model._proxy
+        emitted = []
+        callback = lambda: emitted.append(model._proxy_scale)
+        model.image_changed.connect(callback)
+        try:
+            for width in range(151, 200, 7):
+                model.set_viewport_size(width, 100)
+        finally:
+            model.image_changed.disconnect(callback)
+        assert emitted == [] and model._proxy is proxy
+        assert model._snapshots.longest_prefix(model._namespace(None, 0.5), model._edit_actions)[0] == 1
+
+    def test_save_renders_full_resolution(self, model, tmp_path):
+        model.set_viewport_size(150, 100)
+        model.set_attribute("gaussian_blur", 9)
+        path = str(tmp_path / "out.png")
+        model.save_file(path)
+        expected = Image(model.image.data)
+        expected.gaussian_blur(9)
+        assert np.array_equal(Image.open(path).data, expected.data)
+
+    def test_kernel_sizes_are_scaled(self, model):
+        model.set_viewport_size(150, 100)
+        calls = []
+        def blur(img, value):
+            calls.append(value)
+        model._spatial_methods.add(blur)
+        model._edit_actions.append((blur, 9, True))
+        model.get_data()
+        assert calls == [round(9 * model._proxy_scale)]
+
+
+class TestPointOperations:
+    @staticmethod
+    def legacy_brightness(data, brightness):
+        data = data.copy()
+        if brightness > 0:
+            cv2.add(data, np.full(data.shape, brightness, dtype=np.uint8), data)
+        else:
+            cv2.subtract(data, np.full(data.shape, -brightness, dtype=np.uint8), data)
+        return data
+
+    @staticmethod
+    def legacy_contrast(data, contrast):
+        if contrast >= 0:
+            factor = (259 * (contrast + 255)) / (255 * (259 - contrast))
+        else:
+            factor = (259 * (contrast + 255)) / (255 * (259 + contrast))
+        return np.clip((factor * (data.astype(np.int16) - 128) + 128), 0, 255).astype(np.uint8)
+
+    @pytest.fixture
+    def data(self):
+        return np.arange(256 * 3, dtype=np.uint16).reshape(16, 16, 3).astype(np.uint8)
+
+    @pytest.mark.parametrize("value", range(-100, 101, 7))
+    def test_luts_are_bit_exact(self, data, value):
+        image = Image(data)
+        image.set_brightness(value)
+        assert np.array_equal(image.data, self.legacy_brightness(data, value))
+        image = Image(data)
+        image.set_contrast(value)
+        assert np.array_equal(image.data, self.legacy_contrast(data, value))
+
+    def test_consecutive_point_ops_are_fused(self, data):
+        model = Model()
+        model.set_image(Image(data))
+        model.set_attribute("contrast", 40)
+        model.set_attribute("brightness", -30)
+        model.accept()
+        model.set_attribute("contrast", -20)
+        expected = self.legacy_contrast(self.legacy_brightness(self.legacy_contrast(data, 40), -30), -20)
+        assert np.array_equal(model.get_data(), expected)
+        assert len(model._snapshots) == 1
+
+
+class TestGeometricTransforms:
+    @pytest.fixture
+    def model(self, synthetic_image):
+        model = Model()
+        model.set_image(Image(synthetic_image((6, 9, 3))))
+        return model
+
+    def test_right_angles_are_lossless(self, model):
+        data = model.image.data
+        model.set_attribute("rotate", 90)
+        assert np.array_equal(model.get_data(), np.rot90(data))
+        model.set_attribute("flip_horizontally", None)
+        assert np.array_equal(model.get_data(), np.rot90(data)[:, ::-1])
+        model.set_attribute("rotate", -90)
+        model.set_attribute("rotate", -90)
+        assert np.array_equal(model.get_data(), np.rot90(data)[:, ::-1][::-1, ::-1])
+
+    def test_cancelling_pairs_drop_out(self, model):
+        for name, value in (("rotate", 90), ("flip_vertically", None), ("flip_vertically", None), ("rotate", -90)):
+            model.set_attribute(name, value)
+        assert np.array_equal(model.get_data(), model.image.data)
+        model.set_attribute("rotate", 30)
+        model.set_attribute("rotate", -30)
+        assert np.array_equal(model.get_data(), model.image.data)
+
+    def test_arbitrary_angles_use_a_single_warp(self, model, monkeypatch):
+        warps = []
+        warp_affine = cv2.warpAffine
+        monkeypatch.setattr(cv2, "warpAffine", lambda *args: warps.append(args) or warp_affine(*args))
+        model.set_attribute("flip_horizontally", None)
+        model.set_attribute("rotate", 20)
+        model.set_attribute("rotate", 15)
+        composed = model.get_data()
+        assert len(warps) == 1
+        expected = Image(model.image.data)
+        expected.flip_horizontally()
+        expected.rotate(35)
+        assert composed.shape == expected.data.shape
+        assert np.abs(composed.astype(int) - expected.data).max() <= 1
+
+
+class TestCopyOnWrite:
+    @pytest.fixture
+    def data(self, synthetic_image):
+        return synthetic_image((32, 24, 3))
+
+    @pytest.fixture
+    def stats(self):
+        buffer_pool.clear()
+        allocation_stats.reset()
+        return allocation_stats
+
+    def test_shared_buffers_are_not_mutated(self, data):
+        original = Image(data)
+        shared = original.share()
+        assert shared.data is original.data
+        shared.set_brightness(40)
+        shared.flip_horizontally()
+        assert np.array_equal(original.data, data)
+        original.gaussian_blur(5)
+        assert not np.array_equal(original.data, data)
+        borrowed = Image(data, copy=False)
+        borrowed.rotate(90)
+        assert np.array_equal(borrowed.data, np.rot90(data))
+
+    def test_owned_buffers_are_mutated_in_place(self, data, stats):
+        image = Image(data)
+        buffer = image.data
+        image.set_contrast(20)
+        image.median_filter(3)
+        assert image.data is buffer
+        assert stats.snapshot()["allocations"] == 0
+
+    def test_replay_does_not_copy(self, data, stats):
+        model = Model(cache_budget=0)
+        model.set_image(Image(data, copy=False))
+        model.set_attribute("brightness", 10)
+        model.set_attribute("gaussian_blur", 5)
+        model.set_attribute("sharpen", 3)
+        model.set_attribute("flip_vertically", None)
+        model.get_data()
+        first = stats.snapshot()
+        assert first["copies"] == 0
+        assert first["allocations"] == 2
+        model.get_data()
+        second = stats.snapshot()
+        assert second["allocations"] == first["allocations"] + 1
+        assert second["pool_hits"] > first["pool_hits"]
+        assert np.array_equal(model.image.data, data)
+
+    def test_replay_keeps_source_after_identity_step(self, data, stats):
+        model = Model(cache_budget=0)
+        model.set_image(Image(data))
+        model.set_attribute("sharpen", 1)
+        model.set_attribute("median_blur", 9)
+        model.set_attribute("average_filter", 7)
+        first = np.array(model.get_data())
+        assert np.array_equal(model.image.data, data)
+        assert np.array_equal(model.get_data(), first)
+        assert np.array_equal(model.image.data, data)
+
+    def test_accepted_base_keeps_source(self, data):
+        model = Model()
+        model.set_image(Image(data))
+        model.set_attribute("flip_horizontally", None)
+        model.set_attribute("flip_horizontally", None)
+        model.set_attribute("brightness", 10)
+        model.accept()
+        model.set_attribute("contrast", 10)
+        expected = Image(data)
+        expected.set_brightness(10)
+        expected.set_contrast(10)
+        assert np.array_equal(model.get_image().data, expected.data)
+        assert np.array_equal(model.image.data, data)
+        assert np.array_equal(model.get_image().data, expected.data)
+
+
+class TestHistogram:
+    @pytest.fixture
+    def model(self, synthetic_image):
+        model = Model()
+        model.set_image(Image(synthetic_image((40, 30, 3))))
+        return model
+
+    def expected(self, model):
+        data = model.get_data()
+        return np.stack([np.histogram(data[:, :, c], bins=256, range=(0, 256))[0] for c in range(3)])
+
+    def test_matches_pixel_scan(self, model):
+        assert np.array_equal(model.get_histogram(), self.expected(model))
+        model.set_attribute("gaussian_blur", 5)
+        model.set_attribute("brightness", 30)
+        model.accept()
+        model.set_attribute("contrast", -40)
+        assert np.array_equal(model.get_histogram(), self.expected(model))
+
+    def test_point_ops_remap_without_rendering(self, model, monkeypatch):
+        model.set_attribute("median_blur", 3)
+        model.set_attribute("brightness", 10)
+        model.get_histogram()
+        render = Model._render
+        monkeypatch.setattr(Model, "_render", lambda *args: pytest.fail("pixels rescanned"))
+        for value in (20, 30, -50):
+            model.set_attribute("brightness", value)
+            model.set_attribute("contrast", value)
+            histograms = model.get_histogram()
+        monkeypatch.setattr(Model, "_render", render)
+        assert np.array_equal(histograms, self.expected(model))
+
+    def test_figure_is_built_on_demand(self, model):
+        figure = model.get_histogram_figure()
+        assert len(figure.axes[0].lines) == 3
+        assert Model().get_histogram_figure() is None
+
+
+class TestProgressiveOpen:
+    @pytest.fixture
+    def path(self, synthetic_image):
+        return synthetic_image((20, 16, 3), size=(320, 400), name="synthetic.jpg")
+
+    @pytest.fixture
+    def model(self, monkeypatch):
+        model = Model()
+        model.PROGRESSIVE_MIN_BYTES = 0
+        gate = model.gate = threading.Event()
+        load_full = model._load_full
+        monkeypatch.setattr(model, "_load_full", lambda *args: (gate.wait(5), load_full(*args)))
+        return model
+
+    def test_decode_is_rgb(self, path):
+        expected = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+        assert np.array_equal(read_rgb(path), expected)
+        assert read_rgb(path, 4).shape == (100, 80, 3)
+        with pytest.raises(ValueError):
+            read_rgb(path, 3)
+        with pytest.raises(IOError):
+            read_rgb(path + ".missing")
+
+    def test_reduced_preview_then_full_image(self, model, path):
+        model.set_viewport_size(1000, 1000)
+        model.open_file(path, progressive=True)
+        assert model.is_loading
+        assert model.get_data().shape[:2] == (100, 80)
+        model.gate.set()
+        assert model.wait_until_loaded(5)
+        assert not model.is_loading
+        assert model.image.data.shape[:2] == (400, 320)
+        assert model.get_data().shape[:2] == (400, 320)
+
+    def test_edits_during_load_apply_to_full_image(self, model, path):
+        model.open_file(path, progressive=True)
+        model.set_attribute("brightness", 30)
+        model.set_attribute("gaussian_blur", 5)
+        model.accept()
+        model.set_attribute("rotate", 90)
+        model.get_data()
+        model.gate.set()
+        model.wait_until_loaded(5)
+        reference = Model()
+        reference.open_file(path)
+        reference.apply_recipe(model.get_recipe())
+        assert np.array_equal(model.get_data(), reference.get_data())
+
+    def test_save_waits_for_full_decode(self, model, path, tmp_path):
+        model.open_file(path, progressive=True)
+        threading.Timer(0.05, model.gate.set).start()
+        out = str(tmp_path / "out.png")
+        model.save_file(out)
+        assert cv2.imread(out).shape[:2] == (400, 320)
+
+    def test_stale_decode_is_discarded(self, model, path, tmp_path):
+        model.open_file(path, progressive=True)
+        other = str(tmp_path / "other.png")
+        cv2.imwrite(other, np.zeros((10, 12, 3), dtype=np.uint8))
+        model.open_file(other, progressive=True)
+        assert not model.is_loading
+        model.gate.set()
+        time.sleep(0.1)
+        assert model.image.data.shape[:2] == (10, 12)
+
+    def test_small_files_open_synchronously(self, path):
+        model = Model()
+        model.open_file(path, progressive=True)
+        assert not model.is_loading
+        assert model.image.data.shape[:2] == (400, 320)
+
+
+class TestFilterSelection:
+    @pytest.fixture(params=["noise", "edges", "stripes-1", "stripes-3", "stripes-7"])
+    def data(self, request, synthetic_image):
+        if request.param == "noise":
+            return synthetic_image((150, 200, 3))
+        if request.param.startswith("stripes"):
+            width = int(request.param.partition("-")[2])
+            stripes = (np.arange(200) // width % 2 * 255).astype(np.uint8)
+            return np.ascontiguousarray(np.broadcast_to(stripes[None, :, None], (150, 200, 3)))
+        blocks = np.random.default_rng(0).integers(0, 2, (15, 20, 1), dtype=np.uint8) * 255
+        return np.kron(blocks, np.ones((10, 10, 1), dtype=np.uint8))
+
+    @pytest.mark.parametrize("size", [31, 45, 101, 151, 201, 301])
+    def test_pyramid_gaussian_error_bound(self, data, size):
+        blurred = pyramid_gaussian_blur(data, size).astype(float)
+        exact = cv2.GaussianBlur(data.astype(float), (size, size), size / 6, None, size / 6).reshape(data.shape)
+        assert np.abs(blurred - exact).max() <= pyramid_error_bound(size)
+        quantized = cv2.GaussianBlur(data, (size, size), size / 6, None, size / 6).reshape(data.shape)
+        assert np.abs(blurred - quantized).max() <= 6
+
+    @pytest.mark.parametrize("data", ["noise", "edges"], indirect=True)
+    @pytest.mark.parametrize("size", [31, 45, 101, 201])
+    def test_pyramid_gaussian_error_on_natural_images(self, data, size):
+        exact = cv2.GaussianBlur(data, (size, size), size / 6, None, size / 6).reshape(data.shape)
+        diff = np.abs(pyramid_gaussian_blur(data, size).astype(int) - exact)
+        assert diff.max() <= 3
+        assert diff.mean() < 0.6
+
+    def test_small_gaussian_is_exact(self, data):
+        image = Image(data)
+        image.gaussian_blur(GAUSSIAN_PYRAMID_MIN_SIZE - 2)
+        size = GAUSSIAN_PYRAMID_MIN_SIZE - 2
+        assert np.array_equal(image.data, cv2.GaussianBlur(data, (size, size), size / 6, None, size / 6).reshape(data.shape))
+
+    def test_sharpen_kernel_is_cached(self, data):
+        assert sharpen_kernel(5) is sharpen_kernel(5)
+        assert not sharpen_kernel(5).flags.writeable
+        reference = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=float)
+        image = Image(data)
+        image.sharpen(5)
+        assert np.array_equal(image.data, cv2.filter2D(data, -1, reference).reshape(data.shape))
+        image = Image(data)
+        image.sharpen(1)
+        assert np.array_equal(image.data, data)
+
+
+class TestRegionRendering:
+    @pytest.fixture
+    def model(self, monkeypatch, synthetic_image):
+        monkeypatch.setattr(Model, "REGION_TILE_SIZE", 32)
+        model = Model()
+        model.set_image(Image(synthetic_image((12, 16, 3), size=(160, 120))))
+        for name, value in (("brightness", 20), ("rotate", 90), ("sharpen", 5), ("gaussian_blur", 9)):
+            model.set_attribute(name, value)
+        return model
+
+    def test_region_matches_full_render(self, model):
+        full = model.get_image().data
+        assert model.get_output_size() == full.shape[:2]
+        region = model.get_region_job((0.25, 0.5, 0.5, 1.0))()
+        assert np.array_equal(region, full[40:80, 60:120])
+        assert full.shape[:2] == (160, 120)
+
+    def test_panning_reuses_tiles(self, model, monkeypatch):
+        model.get_region_job((0.0, 0.5, 0.0, 0.5))()
+        rendered = []
+        render_region = model_module.render_region
+        monkeypatch.setattr(model_module, "render_region", lambda *args: rendered.append(args[2]) or render_region(*args))
+        model.get_region_job((0.0, 0.25, 0.0, 0.25))()
+        assert rendered == []
+        model.get_region_job((0.0, 0.5, 0.25, 0.75))()
+        assert rendered == [(0, 96, 64, 96)]
+
+    def test_tiles_follow_edits(self, model):
+        before = model.get_region_job((0.0, 0.5, 0.0, 0.5))()
+        model.set_attribute("brightness", 40)
+        after = model.get_region_job((0.0, 0.5, 0.0, 0.5))()
+        assert np.array_equal(after, model.get_image().data[:80, :60])
+        assert not np.array_equal(before, after)
+        model.accept()
+        assert len(model._tiles) == 0
+
+    def test_zoom_after_accepted_rotation(self, model):
+        model.accept()
+        full = model.get_image().data
+        assert model.get_output_size() == full.shape[:2] == (160, 120)
+        assert np.array_equal(model.get_region_job((0.0, 1.0, 0.0, 1.0))(), full)
+        assert np.array_equal(model.get_region_job((0.5, 1.0, 0.25, 0.75))(), full[80:, 30:90])
+
+    def test_arbitrary_angles_fall_back_to_full_render(self, model):
+        model.set_attribute("rotate", 30)
+        full = model.get_image().data
+        height, width = full.shape[:2]
+        region = model.get_region_job((0.5, 1.0, 0.5, 1.0))()
+        assert np.array_equal(region, full[height // 2:, width // 2:])
+
+
+class TestLinearFusion:
+    @pytest.fixture
+    def data(self, synthetic_image):
+        return synthetic_image((15, 20, 3), size=(200, 150))
+
+    def render(self, data, edits, **kwargs):
+        model = Model(**kwargs)
+        model.set_image(Image(data))
+        for name, value in edits:
+            model.set_attribute(name, value)
+        return model, model.get_data()
+
+    def sequential(self, data, edits):
+        image = Image(data)
+        methods = Model()._methods_map
+        for name, value in edits:
+            methods[name](image, value)
+        return image.data
+
+    def test_adjacent_blurs_run_as_one_pass(self, data, monkeypatch):
+        passes = []
+        sep_filter = cv2.sepFilter2D
+        monkeypatch.setattr(cv2, "sepFilter2D", lambda *args: passes.append(args) or sep_filter(*args))
+        edits = [("gaussian_blur", 5), ("average_filter", 5), ("gaussian_blur", 9)]
+        model, fused = self.render(data, edits)
+        assert [name for name, _ in model.get_steps()] == ["apply_linear"]
+        assert len(passes) == 1
+        assert np.abs(fused.astype(int) - self.sequential(data, edits)).max() <= 1
+
+    @pytest.mark.parametrize("edits", [
+        [("gaussian_blur", 5), ("sharpen", 5)],
+        [("sharpen", 5), ("gaussian_blur", 5)],
+        [("average_filter", 15), ("gaussian_blur", 3)],
+        [("gaussian_blur", 41), ("average_filter", 5)],
+        [("gaussian_blur", 5), ("median_blur", 5), ("gaussian_blur", 5)],
+    ])
+    def test_unprofitable_or_nonlinear_chains_stay_sequential(self, data, edits):
+        model, result = self.render(data, edits)
+        assert "apply_linear" not in [name for name, _ in model.get_steps()]
+        assert np.array_equal(result, self.sequential(data, edits))
+
+    def test_preview_scales_each_kernel(self):
+        model = Model()
+        model.set_attribute("gaussian_blur", 10)
+        model.set_attribute("average_filter", 8)
+        _, method, linear = model._next_step(model._edit_actions, 0, 0.5)
+        assert method is Image.apply_linear
+        assert linear.ops == ((Image.gaussian_blur, 5), (Image.average_filter, 4))
+
+    def test_tiled_and_region_renders_match(self, data):
+        edits = [("gaussian_blur", 7), ("average_filter", 5), ("gaussian_blur", 11), ("rotate", 90), ("sharpen", 3)]
+        model, whole = self.render(data, edits)
+        _, tiled = self.render(data, edits, tiling=TiledExecutor(tile_size=32, memory_cap=0))
+        assert np.array_equal(tiled, whole)
+        assert np.array_equal(model.get_region_job((0.2, 0.6, 0.3, 0.9))(), whole[40:120, 45:135])
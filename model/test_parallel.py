@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from model.model import Model
+from model.parallel import BandExecutor
+from model.processing import Image
+
+
+class TestBandExecutor:
+    @pytest.fixture
+    def image(self, synthetic_image):
+        return Image(synthetic_image((211, 157, 3)))
+
+    @pytest.fixture(params=[1, 3, 4])
+    def executor(self, request):
+        executor = BandExecutor(workers=request.param, min_pixels=0)
+        yield executor
+        executor.shutdown()
+
+    @pytest.mark.parametrize("method, value", [
+        (Image.set_contrast, -30),
+        (Image.average_filter, 7),
+        (Image.gaussian_blur, 10),
+        (Image.gaussian_blur, 61),
+        (Image.median_filter, 9),
+        (Image.sharpen, 6),
+        (Image.rotate, 90),
+        (Image.flip_horizontally, None),
+    ])
+    def test_deterministic_for_any_worker_count(self, image, executor, method, value):
+        original = image.data.copy()
+        expected = Image(image.data)
+        method(expected, value) if value is not None else method(expected)
+        result = executor.run(image, method, value)
+        assert np.array_equal(result.data, expected.data)
+        assert np.array_equal(image.data, original)
+
+    def test_bands_cover_frame(self):
+        executor = BandExecutor(workers=3, bands_per_worker=2)
+        bands = list(executor._tiles(100, 40))
+        assert len(bands) == 6
+        assert bands[0] == (0, 17, 0, 40) and bands[-1][1] == 100
+        executor.shutdown()
+
+    def test_small_frames_run_whole(self, image):
+        assert not BandExecutor(workers=1, min_pixels=0).should_tile(image)
+        executor = BandExecutor(workers=2, min_pixels=image.data.shape[0] * image.data.shape[1] + 1)
+        assert not executor.should_tile(image)
+        executor.shutdown()
+
+    def test_model_renders_identically(self, image):
+        executor = BandExecutor(workers=4, min_pixels=0)
+        parallel, serial = Model(tiling=executor), Model()
+        for model in (parallel, serial):
+            model.set_image(Image(image.data))
+            model.set_attribute("gaussian_blur", 9)
+            model.set_attribute("brightness", 20)
+            model.set_attribute("rotate", 90)
+            model.set_attribute("sharpen", 4)
+        assert np.array_equal(parallel.get_data(), serial.get_data())
+        executor.shutdown()
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from model.model import Model
+from model.processing import Image
+from model.profiling import Profiler, profiler
+from model.signal import Signal
+
+
+class TestProfiler:
+    @pytest.fixture(autouse=True)
+    def reset(self):
+        profiler.reset()
+        yield
+        profiler.disable()
+        profiler.trace_path = None
+        profiler.reset()
+
+    @pytest.fixture
+    def model(self):
+        model = Model()
+        model.set_image(Image(np.zeros((64, 64, 3), dtype=np.uint8)))
+        return model
+
+    def test_disabled_records_nothing(self, model):
+        model.set_attribute("gaussian_blur", 5)
+        model.get_data()
+        assert profiler.stats() == {}
+
+    def test_records_ops_replay_and_signals(self, model):
+        profiler.enable()
+        signal = Signal()
+        signal.connect(lambda: None)
+        signal.emit()
+        model.set_attribute("brightness", 10)
+        model.set_attribute("gaussian_blur", 5)
+        model.get_data()
+        model.get_image()
+        stats = profiler.stats()
+        assert stats["op:gaussian_blur"]["count"] == 1
+        assert stats["op:apply_lut"]["count"] == 1
+        assert stats["replay:full"]["count"] == 2
+        assert stats["replay:full"]["wall"] >= stats["op:gaussian_blur"]["wall_max"]
+        assert any(key.startswith("signal:") for key in stats)
+        assert set(profiler.stats("op")) == {"op:gaussian_blur", "op:apply_lut"}
+
+    def test_tracks_peak_memory_of_nested_measures(self):
+        local = Profiler()
+        local.enable(track_memory=True)
+        with local.measure("outer", "outer"):
+            with local.measure("inner", "inner"):
+                buffer = np.ones(1_000_000, dtype=np.uint8)
+            del buffer
+            small = np.ones(1000, dtype=np.uint8)
+        local.disable()
+        stats = local.stats()
+        assert stats["inner:inner"]["peak_bytes"] >= 1_000_000
+        assert stats["outer:outer"]["peak_bytes"] >= 1_000_000
+
+    def test_cpu_counts_own_thread_and_tasks(self):
+        def spin(seconds):
+            end = time.thread_time() + seconds
+            while time.thread_time() < end:
+                pass
+
+        local = Profiler()
+        local.enable()
+        busy = threading.Thread(target=spin, args=(0.2,))
+        with local.measure("idle", "idle"):
+            busy.start()
+            time.sleep(0.1)
+        busy.join()
+        with local.measure("outer", "outer"):
+            with local.measure("inner", "inner"):
+                worker = threading.Thread(target=local.task(spin), args=(0.05,))
+                worker.start()
+                worker.join()
+        local.disable()
+        stats = local.stats()
+        assert stats["idle:idle"]["cpu"] < 0.05
+        assert stats["inner:inner"]["cpu"] >= 0.05
+        assert stats["outer:outer"]["cpu"] >= 0.05
+
+    def test_chrome_trace(self, model, tmp_path):
+        path = tmp_path / "trace.json"
+        profiler.enable(trace_path=str(path))
+        model.set_attribute("sharpen", 3)
+        model.get_data()
+        profiler.disable()
+        events = json.loads(path.read_text())["traceEvents"]
+        assert {"op", "replay"} <= {event["cat"] for event in events}
+        assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+        assert "op:sharpen" in profiler.summary()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from model.model import Model
+from model.processing import Image
+from model.recipe import load_recipe, make_recipe, normalize_recipe, recipe_hash, render_recipe, save_recipe
+from model.render_cache import RenderCache, file_digest
+
+
+class TestRecipe:
+    @pytest.fixture
+    def path(self, synthetic_image):
+        return synthetic_image((30, 40, 3), name="source.png")
+
+    def edit(self, model):
+        model.set_attribute("brightness", 20.0)
+        model.set_attribute("gaussian_blur", 5)
+        model.accept()
+        model.set_attribute("rotate", 90)
+        model.set_attribute("flip_horizontally", None)
+
+    def test_round_trip(self, path, tmp_path):
+        model = Model()
+        model.open_file(path)
+        self.edit(model)
+        recipe_path = str(tmp_path / "recipe.json")
+        save_recipe(model.get_recipe(), recipe_path)
+        recipe = load_recipe(recipe_path)
+        assert [edit["op"] for edit in recipe["edits"]] == \
+            ["brightness", "gaussian_blur", "accept", "rotate", "flip_horizontally"]
+        replayed = render_recipe(Image.open(path), recipe)
+        assert np.array_equal(replayed.data, model.get_image().data)
+
+    def test_hash_is_normalized(self):
+        recipe = {"version": 1, "edits": [{"op": "brightness", "value": 20.0}, {"op": "accept"}]}
+        assert normalize_recipe(recipe)["edits"] == [{"op": "brightness", "value": 20}, {"op": "accept"}]
+        assert recipe_hash(recipe) == recipe_hash({"version": 1, "edits": [{"value": 20, "op": "brightness"},
+                                                                           {"op": "accept", "value": None}]})
+        assert recipe_hash(recipe) != recipe_hash({"version": 1, "edits": [{"op": "brightness", "value": 21},
+                                                                           {"op": "accept"}]})
+
+    def test_repeated_edits_all_apply(self):
+        accepted = make_recipe([{"op": "brightness", "value": 10}, {"op": "accept"},
+                                {"op": "brightness", "value": 20}])
+        merged = make_recipe([{"op": "brightness", "value": 10}, {"op": "brightness", "value": 20}])
+        image = Image(np.full((4, 4, 3), 100, dtype=np.uint8))
+        assert render_recipe(image, accepted).data.max() == 130
+        assert render_recipe(image, merged).data.max() == 130
+        assert recipe_hash(accepted) != recipe_hash(merged)
+
+    def test_rejects_unknown_ops(self, tmp_path):
+        with pytest.raises(ValueError):
+            Model().apply_recipe({"version": 1, "edits": [{"op": "posterize", "value": 4}]})
+        bad = tmp_path / "bad.json"
+        bad.write_text('{"edits": []}')
+        with pytest.raises(ValueError):
+            load_recipe(str(bad))
+
+    def test_render_cache_hit(self, path, tmp_path, monkeypatch):
+        cache = RenderCache(str(tmp_path / "cache"))
+        model = Model(render_cache=cache)
+        model.open_file(path)
+        self.edit(model)
+        model.save_file(str(tmp_path / "first.png"))
+        key = recipe_hash(model.get_recipe())
+        assert cache.get(file_digest(path), key) is not None
+
+        reopened = Model(render_cache=cache)
+        reopened.open_file(path)
+        reopened.apply_recipe(model.get_recipe())
+        monkeypatch.setattr(Model, "_render", lambda *args: pytest.fail("render cache miss"))
+        reopened.save_file(str(tmp_path / "second.png"))
+        assert np.array_equal(Image.open(str(tmp_path / "first.png")).data,
+                              Image.open(str(tmp_path / "second.png")).data)
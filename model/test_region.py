@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from model.processing import Image, FLIP_HORIZONTALLY, rotation_matrix
+from model.region import output_shape, plan_region, render_region, transform_bounds
+
+STEPS = {
+    "lut": [(Image.set_brightness, 30)],
+    "filters": [(Image.gaussian_blur, 7), (Image.sharpen, 5), (Image.median_filter, 5)],
+    "pyramid": [(Image.gaussian_blur, 41), (Image.average_filter, 9)],
+    "rotated": [(Image.average_filter, 5), (Image.transform, rotation_matrix(90)), (Image.sharpen, 3),
+                (Image.transform, FLIP_HORIZONTALLY), (Image.gaussian_blur, 9)],
+    "transposed": [(Image.transform, FLIP_HORIZONTALLY @ rotation_matrix(-90)), (Image.median_filter, 3)],
+}
+
+
+@pytest.fixture
+def image(synthetic_image):
+    return Image(synthetic_image((18, 25, 3), size=(250, 180)))
+
+
+def render_full(image, steps):
+    result = image.share()
+    for method, value in steps:
+        method(result, value)
+    return result.data
+
+
+@pytest.mark.parametrize("name", sorted(STEPS))
+@pytest.mark.parametrize("bounds", [(0, 40, 0, 50), (70, 130, 100, 170), (150, 180, 200, 250), (0, 180, 0, 180)])
+def test_render_region_matches_full_render(image, name, bounds):
+    steps = STEPS[name]
+    height, width = output_shape(image.data.shape[:2], steps)
+    y0, y1, x0, x1 = bounds
+    bounds = (min(y0, height - 20), min(y1, height), min(x0, width - 20), min(x1, width))
+    expected = render_full(image, steps)[bounds[0]:bounds[1], bounds[2]:bounds[3]]
+    assert np.array_equal(render_region(image, steps, bounds).data, expected)
+
+
+def test_input_region_stays_local(image):
+    regions = plan_region((180, 250), STEPS["filters"], (80, 100, 80, 100))
+    assert regions[-1] == (80, 100, 80, 100)
+    top, bottom, left, right = regions[0]
+    assert bottom - top < 40 and right - left < 40
+
+
+def test_transform_bounds_round_trip():
+    matrix = rotation_matrix(90)
+    mapped = transform_bounds((10, 20, 30, 60), matrix, (180, 250))
+    assert transform_bounds(mapped, matrix.T, (250, 180)) == (10, 20, 30, 60)
+
+
+def test_unsupported_transform(image):
+    assert render_region(image, [(Image.transform, rotation_matrix(30))], (0, 10, 0, 10)) is None
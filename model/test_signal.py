@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+import pytest
+
+from model.model import Model
+from model.processing import Image
+from model.signal import Signal
+
+
+class TestSignal:
+    @pytest.fixture
+    def signal(self):
+        signal = Signal()
+        signal.calls = []
+        signal.connect(lambda *args: signal.calls.append(args))
+        return signal
+
+    def test_emits_immediately(self, signal):
+        signal.emit(1)
+        signal.emit(2)
+        assert signal.calls == [(1,), (2,)]
+
+    def test_coalesce_fires_last_emit_once(self, signal):
+        with signal.coalesce():
+            signal.emit(1)
+            with signal.coalesce():
+                signal.emit(2)
+            assert signal.calls == []
+            signal.emit(3)
+        assert signal.calls == [(3,)]
+
+    def test_coalesce_without_emit_is_silent(self, signal):
+        with signal.coalesce():
+            pass
+        assert signal.calls == []
+
+    def test_coalesce_fires_after_errors(self, signal):
+        with pytest.raises(ValueError):
+            with signal.coalesce():
+                signal.emit(1)
+                raise ValueError()
+        assert signal.calls == [(1,)]
+
+
+class TestModelBatch:
+    @pytest.fixture
+    def model(self):
+        model = Model()
+        model.set_image(Image(np.zeros((16, 16, 3), dtype=np.uint8)))
+        return model
+
+    @pytest.fixture
+    def emits(self, model):
+        emits = []
+        callback = lambda: emits.append(model.get_data().copy())
+        model.image_changed.connect(callback)
+        yield emits
+        model.image_changed.disconnect(callback)
+
+    def test_batch_renders_once(self, model, emits):
+        with model.batch():
+            model.set_attribute("brightness", 10)
+            model.set_attribute("contrast", 20)
+            model.set_attribute("rotate", 90)
+        assert len(emits) == 1
+        model.set_attribute("brightness", 30)
+        assert len(emits) == 2
+
+    def test_batch_only_holds_its_own_model(self, model, emits):
+        other = Model()
+        other.set_image(Image(np.zeros((16, 16, 3), dtype=np.uint8)))
+        with other.batch():
+            model.set_attribute("brightness", 10)
+            assert len(emits) == 1
+
+    def test_emits_outside_image_lock(self, model):
+        locked = []
+
+        def probe():
+            acquired = model._image_lock.acquire(timeout=1)
+            if acquired:
+                model._image_lock.release()
+            locked.append(not acquired)
+
+        def callback():
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+        model.image_changed.connect(callback)
+        model.set_attribute("brightness", 10)
+        model.cancel_accept()
+        model.set_attribute("contrast", 10)
+        model.accept()
+        model.cancel_accept()
+        model.cancel()
+        assert locked == [False] * 5
+
+    def test_apply_recipe_renders_once(self, model, emits):
+        model.apply_recipe({"version": 1, "edits": [{"op": "brightness", "value": 10}, {"op": "accept"},
+                                                    {"op": "sharpen", "value": 3}, {"op": "flip_vertically"}]})
+        assert len(emits) == 1
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+import pytest
+
+from model.processing import Image, FLIP_HORIZONTALLY, FLIP_VERTICALLY, compose_transforms, rotation_matrix
+from model.recipe import make_recipe, render_recipe
+from model.stack import ImageStack, render_stack
+
+
+@pytest.fixture
+def data(synthetic_image):
+    return synthetic_image((4, 30, 40, 3))
+
+
+def per_frame(data, method, *args):
+    frames = []
+    for frame in data:
+        image = Image(frame)
+        method(image, *args)
+        frames.append(image.data)
+    return np.stack(frames)
+
+
+class TestImageStack:
+    def test_rejects_single_frame(self, data):
+        with pytest.raises(ValueError):
+            ImageStack(data[0])
+
+    def test_frames(self, data):
+        stack = ImageStack(data)
+        assert len(stack) == 4
+        assert stack.num_channels == 3
+        assert np.array_equal(stack[2].data, data[2])
+        assert np.array_equal(ImageStack.from_images(stack.frames()).data, data)
+
+    @pytest.mark.parametrize("method, value", [
+        ("set_brightness", 40), ("set_brightness", -70), ("set_contrast", 30), ("set_contrast", -50),
+        ("average_filter", 5), ("gaussian_blur", 7), ("gaussian_blur", 41), ("median_filter", 3),
+        ("sharpen", 5), ("rotate", 90), ("rotate", -90), ("rotate", 180), ("rotate", 30),
+    ])
+    def test_matches_per_frame(self, data, method, value):
+        stack = ImageStack(data, workers=2)
+        getattr(stack, method)(value)
+        assert np.array_equal(stack.data, per_frame(data, getattr(Image, method), value))
+
+    @pytest.mark.parametrize("matrix", [
+        FLIP_HORIZONTALLY, FLIP_VERTICALLY, compose_transforms(FLIP_HORIZONTALLY, FLIP_VERTICALLY),
+        compose_transforms(rotation_matrix(90), FLIP_HORIZONTALLY),
+        compose_transforms(rotation_matrix(-90), FLIP_HORIZONTALLY),
+    ])
+    def test_exact_transforms(self, data, matrix):
+        stack = ImageStack(data)
+        stack.transform(matrix)
+        assert stack.data.flags.c_contiguous
+        assert np.array_equal(stack.data, per_frame(data, Image.transform, matrix))
+
+    def test_flips(self, data):
+        stack = ImageStack(data)
+        stack.flip_horizontally()
+        stack.flip_vertically()
+        expected = per_frame(per_frame(data, Image.flip_horizontally), Image.flip_vertically)
+        assert np.array_equal(stack.data, expected)
+
+    def test_histograms(self, data):
+        histograms = ImageStack(data).get_histograms()
+        assert histograms.shape == (4, 3, 256)
+        assert np.array_equal(histograms[1], Image(data[1]).get_histograms())
+
+    def test_does_not_modify_input(self, data):
+        original = data.copy()
+        ImageStack(data).set_brightness(50)
+        assert np.array_equal(data, original)
+
+    def test_open(self, data, tmp_path):
+        paths = []
+        for idx, frame in enumerate(data):
+            path = str(tmp_path / f"{idx}.png")
+            cv2.imwrite(path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            paths.append(path)
+        assert np.array_equal(ImageStack.open(paths).data, data)
+
+
+class TestRenderStack:
+    def test_matches_render_recipe(self, data):
+        recipe = make_recipe([
+            {"op": "brightness", "value": 20}, {"op": "contrast", "value": 15}, {"op": "rotate", "value": 90},
+            {"op": "flip_horizontally", "value": None}, {"op": "gaussian_blur", "value": 5},
+            {"op": "average_filter", "value": 3}, {"op": "accept"},
+            {"op": "rotate", "value": 15}, {"op": "rotate", "value": 20}, {"op": "median_blur", "value": 3},
+        ])
+        result = render_stack(ImageStack(data), recipe)
+        expected = np.stack([render_recipe(Image(frame), recipe).data for frame in data])
+        assert np.array_equal(result.data, expected)
+
+    def test_unknown_edit(self, data):
+        with pytest.raises(ValueError):
+            render_stack(ImageStack(data), make_recipe([{"op": "posterize", "value": 4}]))
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from model.processing import Image
+from model.recipe import make_recipe, render_recipe
+from model.stream import main, prefetch, process_frames, read_frames, render_stream, sequence_paths
+
+RECIPE = make_recipe([{"op": "brightness", "value": 30}, {"op": "rotate", "value": 90},
+                      {"op": "gaussian_blur", "value": 5}])
+
+
+@pytest.fixture
+def frames(synthetic_image):
+    return [synthetic_image((6, 8, 3), size=(64, 48), seed=seed) for seed in range(7)]
+
+
+@pytest.fixture
+def sequence(frames, tmp_path):
+    pattern = str(tmp_path / "in" / "%03d.png")
+    (tmp_path / "in").mkdir()
+    for idx, frame in enumerate(frames):
+        cv2.imwrite(pattern % idx, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    return pattern
+
+
+class TestPrefetch:
+    def test_is_bounded(self):
+        produced = []
+
+        def source():
+            for idx in range(100):
+                produced.append(idx)
+                yield idx
+
+        stream = prefetch(source(), 3)
+        assert next(stream) == 0
+        time.sleep(0.05)
+        assert len(produced) <= 5
+        stream.close()
+
+    def test_reraises_decode_errors(self):
+        def source():
+            yield 1
+            raise IOError("broken frame")
+
+        with pytest.raises(IOError):
+            list(prefetch(source(), 2))
+
+
+class TestProcessFrames:
+    def test_keeps_order(self, frames):
+        def render(image):
+            time.sleep(0.01 * (image.data[0, 0, 0] % 3))
+            image.set_brightness(10)
+            return image
+
+        result = [image.data for image in process_frames(list(frames), render, workers=3, prefetch_size=2)]
+        assert len(result) == len(frames)
+        for data, frame in zip(result, frames):
+            assert np.array_equal(data, cv2.LUT(frame, np.clip(np.arange(256) + 10, 0, 255).astype(np.uint8)))
+
+    def test_limits_frames_in_flight(self, frames):
+        active = []
+        lock = threading.Lock()
+
+        def source():
+            for frame in frames * 4:
+                with lock:
+                    active.append(1)
+                yield frame
+
+        def render(image):
+            return image
+
+        peak = 0
+        for _ in process_frames(source(), render, workers=2, prefetch_size=2):
+            with lock:
+                active.pop()
+                peak = max(peak, len(active))
+        assert peak <= 2 + 2 + 2 + 1
+
+
+class TestRenderStream:
+    def test_sequence_matches_render_recipe(self, frames, sequence, tmp_path):
+        output = str(tmp_path / "out" / "%03d.png")
+        stats = render_stream(sequence, output, RECIPE, workers=2, prefetch_size=2)
+        assert stats.frames == len(frames)
+        assert stats.fps > 0
+        assert sequence_paths(output) == [output % idx for idx in range(len(frames))]
+        for idx, frame in enumerate(frames):
+            expected = render_recipe(Image(frame), RECIPE).data
+            assert np.array_equal(Image.open(output % idx).data, expected)
+
+    def test_video_round_trip(self, frames, sequence, tmp_path):
+        video = str(tmp_path / "clip.avi")
+        render_stream(sequence, video, make_recipe([]), fps=10)
+        output = str(tmp_path / "edited.avi")
+        progress = []
+        stats = render_stream(video, output, RECIPE, on_progress=lambda s: progress.append(s.frames))
+        assert progress == list(range(1, len(frames) + 1))
+        decoded = list(read_frames(output))
+        assert len(decoded) == len(frames)
+        assert decoded[0].shape == (64, 48, 3)
+        assert cv2.VideoCapture(output).get(cv2.CAP_PROP_FPS) == 10
+        assert stats.frames == len(frames)
+
+    def test_missing_video(self, tmp_path):
+        with pytest.raises(IOError):
+            list(read_frames(str(tmp_path / "missing.avi")))
+
+    def test_sequence_starting_at_one(self, frames, tmp_path):
+        pattern = str(tmp_path / "%05d.png")
+        for idx, frame in enumerate(frames, 1):
+            cv2.imwrite(pattern % idx, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        assert sequence_paths(pattern) == [pattern % idx for idx in range(1, len(frames) + 1)]
+        assert render_stream(pattern, str(tmp_path / "out" / "%03d.png"), RECIPE).frames == len(frames)
+
+    def test_empty_source(self, tmp_path, capsys):
+        with pytest.raises(ValueError):
+            render_stream(str(tmp_path / "%05d.png"), str(tmp_path / "out.avi"), RECIPE)
+        assert main([str(tmp_path / "*.png"), str(tmp_path / "out" / "%03d.png")]) == 1
+        assert "no frames" in capsys.readouterr().err
+
+    def test_main(self, sequence, tmp_path, capsys):
+        output = str(tmp_path / "out" / "%03d.jpg")
+        assert main([sequence, output, "-e", "contrast=20", "-j", "2"]) == 0
+        assert "7 frames" in capsys.readouterr().err
+        assert len(sequence_paths(output)) == 7
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from model.model import Model
+from model.processing import Image, rotation_matrix, compose_transforms, FLIP_VERTICALLY
+from model.tiling import TiledExecutor
+
+
+class TestTiledExecutor:
+    @pytest.fixture
+    def image(self, synthetic_image):
+        return Image(synthetic_image((203, 157, 3)))
+
+    @pytest.fixture
+    def executor(self, tmp_path):
+        return TiledExecutor(tile_size=48, memory_cap=0, spill_dir=str(tmp_path))
+
+    def untiled(self, image, method, value):
+        result = Image(image.data)
+        method(result, value) if value is not None else method(result)
+        return result.data
+
+    @pytest.mark.parametrize("method, value", [
+        (Image.set_brightness, 40),
+        (Image.set_contrast, -30),
+        (Image.average_filter, 7),
+        (Image.gaussian_blur, 10),
+        (Image.gaussian_blur, 31),
+        (Image.gaussian_blur, 61),
+        (Image.median_filter, 5),
+        (Image.median_filter, 9),
+        (Image.sharpen, 6),
+        (Image.rotate, 90),
+        (Image.rotate, -90),
+        (Image.flip_horizontally, None),
+        (Image.flip_vertically, None),
+        (Image.transform, compose_transforms(FLIP_VERTICALLY, rotation_matrix(90))),
+    ])
+    def test_bit_identical_to_untiled(self, image, executor, method, value):
+        result = executor.run(image, method, value)
+        assert isinstance(result.data, np.memmap)
+        assert np.array_equal(result.data, self.untiled(image, method, value))
+
+    def test_unsupported_ops_fall_back(self, image, executor):
+        result = executor.run(image, Image.rotate, 30)
+        assert np.array_equal(result.data, self.untiled(image, Image.rotate, 30))
+
+    def test_input_is_not_modified(self, image, executor):
+        data = image.data.copy()
+        executor.run(image, Image.gaussian_blur, 9)
+        assert np.array_equal(image.data, data)
+
+    def test_model_replay(self, image, tmp_path):
+        tiled = Model(tiling=TiledExecutor(tile_size=64, memory_cap=1024, spill_dir=str(tmp_path)))
+        plain = Model()
+        for model in (tiled, plain):
+            model.set_image(image)
+            model.set_attribute("brightness", 20)
+            model.set_attribute("contrast", 15)
+            model.set_attribute("gaussian_blur", 9)
+            model.set_attribute("rotate", 90)
+            model.set_attribute("sharpen", 4)
+        assert np.array_equal(tiled.get_data(), plain.get_data())
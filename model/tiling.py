@@ -0,0 +1,134 @@
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, Tuple, Union
+
+import numpy as np
+
+from model.buffers import buffer_pool
+from model.processing import (Image, LinearFilter, valid_kernel_size, gaussian_footprint, rotation_matrix,
+                              FLIP_HORIZONTALLY, FLIP_VERTICALLY)
+
+Bounds = Tuple[int, int, int, int]
+
+
+def _kernel_halo(size: int) -> Tuple[int, int]:
+    return valid_kernel_size(size) // 2, 1
+
+
+def _gaussian_halo(size: int) -> Tuple[int, int]:
+    return gaussian_footprint(valid_kernel_size(size))
+
+
+def _linear_halo(linear: LinearFilter) -> Tuple[int, int]:
+    if len(linear.ops) == 1:
+        return HALOS[linear.ops[0][0]](linear.ops[0][1])
+    return len(linear.kernel) // 2, 1
+
+
+HALOS = {
+    Image.apply_lut: lambda _: (0, 1),
+    Image.set_brightness: lambda _: (0, 1),
+    Image.set_contrast: lambda _: (0, 1),
+    Image.average_filter: _kernel_halo,
+    Image.gaussian_blur: _gaussian_halo,
+    Image.median_filter: _kernel_halo,
+    Image.sharpen: lambda _: (1, 1),
+    Image.apply_linear: _linear_halo
+}
+
+TRANSFORMS = {
+    Image.transform: lambda matrix: matrix,
+    Image.rotate: rotation_matrix,
+    Image.flip_horizontally: lambda _: FLIP_HORIZONTALLY,
+    Image.flip_vertically: lambda _: FLIP_VERTICALLY
+}
+
+
+def supports_tiling(method: Callable, value: Any = None) -> bool:
+    if method in HALOS:
+        return True
+    if method in TRANSFORMS:
+        matrix = TRANSFORMS[method](value)
+        return np.array_equal(matrix, np.round(matrix))
+    return False
+
+
+class TiledExecutor:
+    def __init__(self, tile_size: int = 1024, memory_cap: int = 512 * 1024 * 1024,
+                 spill_dir: Union[str, None] = None):
+        self.tile_size = tile_size
+        self.memory_cap = memory_cap
+        self.spill_dir = spill_dir
+
+    def should_tile(self, image: Image) -> bool:
+        return image.data.nbytes > self.memory_cap
+
+    def supports(self, method: Callable, value: Any = None) -> bool:
+        return supports_tiling(method, value)
+
+    def run(self, image: Image, method: Callable, value: Any = None) -> Image:
+        if not self.supports(method, value):
+            result = image.share()
+            if value is not None:
+                method(result, value)
+            else:
+                method(result)
+            return result
+        if method in TRANSFORMS:
+            return self._run_transform(image, TRANSFORMS[method](value))
+        return self._run_local(image, method, value, *HALOS[method](value))
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        if int(np.prod(shape)) * np.dtype(dtype).itemsize > self.memory_cap:
+            return np.memmap(tempfile.TemporaryFile(dir=self.spill_dir), dtype=dtype, mode="w+", shape=shape)
+        return np.empty(shape, dtype=dtype)
+
+    def _tiles(self, height: int, width: int) -> Iterator[Bounds]:
+        for y0 in range(0, height, self.tile_size):
+            for x0 in range(0, width, self.tile_size):
+                yield y0, min(y0 + self.tile_size, height), x0, min(x0 + self.tile_size, width)
+
+    def _map(self, func: Callable[[Bounds], None], tiles: Iterable[Bounds]) -> None:
+        for tile in tiles:
+            func(tile)
+
+    def _run_local(self, image: Image, method: Callable, value: Any, halo: int, alignment: int) -> Image:
+        data = image.data
+        height, width = data.shape[:2]
+        out = self._allocate(data.shape, data.dtype)
+
+        def process(bounds: Bounds) -> None:
+            y0, y1, x0, x1 = bounds
+            top = max(0, y0 - halo) // alignment * alignment
+            left = max(0, x0 - halo) // alignment * alignment
+            bottom, right = min(height, y1 + halo), min(width, x1 + halo)
+            tile = Image(data[top:bottom, left:right], copy=False)
+            if value is not None:
+                method(tile, value)
+            else:
+                method(tile)
+            out[y0:y1, x0:x1] = tile.data[y0 - top:y1 - top, x0 - left:x1 - left]
+            buffer_pool.release(tile.data)
+        self._map(process, self._tiles(height, width))
+        return Image(out, copy=False)
+
+    def _run_transform(self, image: Image, matrix: np.ndarray) -> Image:
+        data = image.data
+        height, width = data.shape[:2]
+        new_width = int(round(height * abs(matrix[0, 1]) + width * abs(matrix[0, 0])))
+        new_height = int(round(height * abs(matrix[1, 1]) + width * abs(matrix[1, 0])))
+        out = self._allocate((new_height, new_width) + data.shape[2:], data.dtype)
+        center = np.array([width - 1, height - 1]) / 2
+        new_center = np.array([new_width - 1, new_height - 1]) / 2
+
+        def process(bounds: Bounds) -> None:
+            y0, y1, x0, x1 = bounds
+            corners = np.array([[x0, x1 - 1], [y0, y1 - 1]], dtype=float)
+            mapped = matrix @ (corners - center[:, None]) + new_center[:, None]
+            left, top = np.round(mapped.min(axis=1)).astype(int)
+            tile = Image(data[y0:y1, x0:x1], copy=False)
+            tile.transform(matrix)
+            tile_height, tile_width = tile.data.shape[:2]
+            out[top:top + tile_height, left:left + tile_width] = tile.data
+            buffer_pool.release(tile.data)
+        self._map(process, self._tiles(height, width))
+        return Image(out, copy=False)
@@ -1,23 +1,131 @@
+from typing import Callable, Tuple, Union
+
+import cv2
+import numpy as np
+
+from model.export import ExportTarget
+from model.profiling import profiler
+from presenter.worker import RenderWorker
+
+
+def fit_to_viewport(data: Union[np.ndarray, None], viewport: Union[Tuple[int, int], None]) -> Union[np.ndarray, None]:
+    if data is None:
+        return None
+    height, width = data.shape[:2]
+    with profiler.measure("display", "fit_to_viewport"):
+        if viewport is not None:
+            scale = min(viewport[0] / width, viewport[1] / height)
+            if scale < 1.0:
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                data = cv2.resize(data, size, interpolation=cv2.INTER_AREA).reshape((size[1], size[0]) + data.shape[2:])
+        return np.ascontiguousarray(data)
+
+
+def scale_to(data: Union[np.ndarray, None], size: Tuple[int, int]) -> Union[np.ndarray, None]:
+    if data is None:
+        return None
+    height, width = data.shape[:2]
+    with profiler.measure("display", "scale_to"):
+        if (width, height) != size:
+            interpolation = cv2.INTER_NEAREST if size[0] > width else cv2.INTER_AREA
+            data = cv2.resize(data, size, interpolation=interpolation).reshape((size[1], size[0]) + data.shape[2:])
+        return np.ascontiguousarray(data)
 
 
 class Presenter:
+    ZOOM_STEP = 1.25
+    MAX_ZOOM = 64.0
+
     def __init__(self, model, view):
         self.model = model
         self.model.image_changed.connect(self.update_view)
+        self.model.image_loaded.connect(self._image_loaded)
         self.view = view
+        self.render_worker = RenderWorker(lambda result: self.view.data_rendered.emit(*result))
+        self._viewport = None
+        self._render_version = 0
+        self._zoom = 1.0
+        self._center = (0.5, 0.5)
+        self.export_job = None
+
+    def batch(self):
+        return self.model.batch()
+
+    def _image_loaded(self):
+        # the full decode finishes on its own thread; the view queues update_view back onto the GUI thread
+        self.view.image_loaded.emit()
 
     def handle_new_image(self):
         self.model.clear()
 
     def handle_open_file(self, fname: str):
-        self.model.open_file(fname)
+        self.model.open_file(fname, progressive=True)
 
     def handle_save_file(self, fname: str):
-        self.model.save_file(fname)
+        self.handle_cancel_export()
+        self.export_job = self.model.export([ExportTarget(fname)], on_progress=self.view.export_progress.emit,
+                                            on_finished=self.view.export_finished.emit)
+
+    def handle_cancel_export(self):
+        if self.export_job is not None and not self.export_job.finished:
+            self.export_job.cancel()
+
+    def handle_viewport_resized(self, width: int, height: int):
+        self._viewport = (width, height)
+        self.model.set_viewport_size(width, height)
+
+    def _display_job(self, render: Callable, version: int, viewport: Union[Tuple[int, int], None]):
+        return lambda: (fit_to_viewport(render(), viewport), version)
+
+    def _visible_region(self, zoom: float) -> Union[Tuple[Tuple[float, float, float, float], Tuple[int, int]], None]:
+        size = self.model.get_output_size()
+        if size is None or self._viewport is None or zoom <= 1.0:
+            return None
+        height, width = size
+        scale = min(self._viewport[0] / width, self._viewport[1] / height) * zoom
+        span_x, span_y = min(1.0, self._viewport[0] / (width * scale)), min(1.0, self._viewport[1] / (height * scale))
+        center_x = min(max(self._center[0], span_x / 2), 1.0 - span_x / 2)
+        center_y = min(max(self._center[1], span_y / 2), 1.0 - span_y / 2)
+        fractions = (center_y - span_y / 2, center_y + span_y / 2, center_x - span_x / 2, center_x + span_x / 2)
+        return fractions, (max(1, round(span_x * width * scale)), max(1, round(span_y * height * scale)))
+
+    def handle_zoom(self, steps: int, x: float = 0.5, y: float = 0.5):
+        zoom = min(self.MAX_ZOOM, max(1.0, self._zoom * self.ZOOM_STEP ** steps))
+        before, after = self._visible_region(self._zoom), self._visible_region(zoom)
+        if after is not None:
+            top, bottom, left, right = before[0] if before is not None else (0.0, 1.0, 0.0, 1.0)
+            anchor_x, anchor_y = left + x * (right - left), top + y * (bottom - top)
+            top, bottom, left, right = after[0]
+            self._center = (anchor_x + (0.5 - x) * (right - left), anchor_y + (0.5 - y) * (bottom - top))
+        else:
+            self._center = (0.5, 0.5)
+        self._zoom = zoom
+        self.update_view()
+
+    def handle_pan(self, dx: int, dy: int):
+        region = self._visible_region(self._zoom)
+        if region is None:
+            return
+        (top, bottom, left, right), (width, height) = region
+        self._center = (left + (right - left) * (0.5 - dx / width), top + (bottom - top) * (0.5 - dy / height))
+        self.update_view()
+
+    def handle_zoom_reset(self):
+        self._zoom, self._center = 1.0, (0.5, 0.5)
+        self.update_view()
+
+    def _region_job(self, render: Callable, version: int, size: Tuple[int, int]):
+        return lambda: (scale_to(render(), size), version)
 
     def update_view(self):
-        data = self.model.get_data()
-        self.view.set_data(data)
+        self._render_version += 1
+        region = self._visible_region(self._zoom)
+        if region is None:
+            job = self._display_job(self.model.get_render_job(), self._render_version, self._viewport)
+        else:
+            fractions, size = region
+            job = self._region_job(self.model.get_region_job(fractions), self._render_version, size)
+        self.render_worker.submit(job)
 
     def handle_brightness_changed(self, brightness: float):
         self.model.set_attribute("brightness", brightness)
@@ -0,0 +1,144 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from model.model import Model
+from presenter.presenter import Presenter, fit_to_viewport, scale_to
+from presenter.worker import RenderWorker
+
+
+class FakeSignal:
+    def __init__(self):
+        self.results = []
+
+    def emit(self, *args):
+        self.results.append(args)
+
+
+class FakeView:
+    def __init__(self):
+        self.data_rendered = FakeSignal()
+        self.export_progress = FakeSignal()
+        self.export_finished = FakeSignal()
+        self.image_loaded = FakeSignal()
+
+
+class TestRenderWorker:
+    def test_latest_wins(self):
+        results = []
+        started, release = threading.Event(), threading.Event()
+        worker = RenderWorker(results.append)
+        worker.submit(lambda: started.set() or release.wait() and "first")
+        assert started.wait(5)
+        for value in range(10):
+            worker.submit(lambda value=value: value)
+        release.set()
+        assert worker.wait_idle(5)
+        worker.stop()
+        assert results == ["first", 9]
+
+    def test_failing_job_keeps_worker_alive(self, capsys):
+        results = []
+        worker = RenderWorker(results.append)
+        worker.submit(lambda: 1 / 0)
+        assert worker.wait_idle(5)
+        worker.submit(lambda: "ok")
+        assert worker.wait_idle(5)
+        worker.stop()
+        assert results == ["ok"]
+        assert "ZeroDivisionError" in capsys.readouterr().err
+
+
+class TestPresenter:
+    @pytest.fixture
+    def presenter(self, tmp_path):
+        path = str(tmp_path / "synthetic.png")
+        cv2.imwrite(path, np.full((40, 30, 3), 100, dtype=np.uint8))
+        presenter = Presenter(Model(), FakeView())
+        presenter.handle_open_file(path)
+        yield presenter
+        presenter.render_worker.stop()
+
+    def test_update_view_renders_in_background(self, presenter):
+        presenter.handle_brightness_changed(20)
+        assert presenter.render_worker.wait_idle(5)
+        data, version = presenter.view.data_rendered.results[-1]
+        assert data.max() == 120
+        assert version == presenter._render_version
+
+    def test_display_data_fits_viewport(self, presenter):
+        presenter.handle_viewport_resized(15, 15)
+        presenter.handle_rotate_left()
+        assert presenter.render_worker.wait_idle(5)
+        data, _ = presenter.view.data_rendered.results[-1]
+        assert data.shape == (11, 15, 3)
+        assert data.flags.c_contiguous
+
+    def test_render_job_snapshots_actions(self, presenter):
+        job = presenter.model.get_render_job()
+        presenter.model.set_attribute("brightness", 50)
+        assert job().max() == 100
+
+    def test_batch_submits_one_render(self, presenter):
+        version = presenter._render_version
+        with presenter.batch():
+            presenter.handle_brightness_changed(20)
+            presenter.handle_rotate_left()
+            presenter.handle_flip_horizontally()
+        assert presenter._render_version == version + 1
+        assert presenter.render_worker.wait_idle(5)
+        data, _ = presenter.view.data_rendered.results[-1]
+        assert data.shape == (30, 40, 3)
+
+    def test_save_exports_in_background(self, presenter, tmp_path):
+        presenter.handle_brightness_changed(20)
+        path = str(tmp_path / "out.png")
+        presenter.handle_save_file(path)
+        assert presenter.export_job.wait(5)
+        (job,), = presenter.view.export_finished.results
+        assert job.written == [path] and job.error is None
+        assert [progress for progress, in presenter.view.export_progress.results][-1] == 1.0
+        assert cv2.imread(path).max() == 120
+
+    def test_full_decode_is_handed_to_the_view(self, presenter, tmp_path):
+        path = str(tmp_path / "large.jpg")
+        cv2.imwrite(path, np.full((400, 320, 3), 100, dtype=np.uint8))
+        presenter.model.PROGRESSIVE_MIN_BYTES = 0
+        presenter.handle_open_file(path)
+        version = presenter._render_version
+        for thread in threading.enumerate():
+            if thread.name == "FullDecode":
+                thread.join(5)
+        assert presenter.model.image.data.shape[:2] == (400, 320)
+        assert presenter.view.image_loaded.results == [()]
+        assert presenter._render_version == version
+
+    def test_zoom_renders_visible_region(self, presenter, monkeypatch):
+        monkeypatch.setattr(Presenter, "ZOOM_STEP", 2.0)
+        presenter.model.image.data[:] = np.arange(40 * 30 * 3, dtype=np.uint32).reshape(40, 30, 3) % 251
+        presenter.model._snapshots.clear()
+        presenter.handle_viewport_resized(20, 20)
+        presenter.handle_zoom(2)
+        assert presenter.render_worker.wait_idle(5)
+        data, _ = presenter.view.data_rendered.results[-1]
+        full = presenter.model.get_image().data
+        assert np.array_equal(data, scale_to(full[15:25, 10:20], (20, 20)))
+        presenter.handle_pan(-10, 0)
+        assert presenter.render_worker.wait_idle(5)
+        data, _ = presenter.view.data_rendered.results[-1]
+        assert np.array_equal(data, scale_to(full[15:25, 15:25], (20, 20)))
+        presenter.handle_zoom_reset()
+        assert presenter.render_worker.wait_idle(5)
+        data, _ = presenter.view.data_rendered.results[-1]
+        assert data.shape == (20, 15, 3)
+
+
+def test_fit_to_viewport():
+    data = np.zeros((100, 60, 3), dtype=np.uint8)[:, ::2]
+    assert fit_to_viewport(data, None).flags.c_contiguous
+    assert fit_to_viewport(data, (300, 300)).shape == (100, 30, 3)
+    assert fit_to_viewport(data, (30, 20)).shape == (20, 6, 3)
+    assert fit_to_viewport(np.zeros((10, 10, 1), dtype=np.uint8), (5, 5)).shape == (5, 5, 1)
+    assert fit_to_viewport(None, (5, 5)) is None
@@ -0,0 +1,47 @@
+import threading
+import traceback
+from typing import Any, Callable, Union
+
+
+class RenderWorker:
+    def __init__(self, on_result: Callable[[Any], None]):
+        self.on_result = on_result
+        self._pending = None
+        self._running = True
+        self._condition = threading.Condition()
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name="RenderWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[], Any]) -> None:
+        with self._condition:
+            self._pending = job
+            self._condition.notify()
+
+    def wait_idle(self, timeout: Union[float, None] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._pending = None
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                job, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self.on_result(job())
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
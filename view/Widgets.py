@@ -1,10 +1,13 @@
+from collections import OrderedDict
 from contextlib import contextmanager
 
 from PyQt5.QtWidgets import (QLabel, QScrollArea, QWidget, QMainWindow, QSizePolicy,
                              QHBoxLayout, QVBoxLayout, QBoxLayout, QUndoCommand,
                              QSlider, QPushButton, QSpacerItem)
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, QSize, pyqtSignal
+
+from model.profiling import profiler
 
 
 class CenterWidget(QWidget):
@@ -17,11 +20,20 @@ class CenterWidget(QWidget):
 
 
 class ImageWindow(QMainWindow):
+    onResize = pyqtSignal(int, int)
+    onZoom = pyqtSignal(int, float, float)
+    onPan = pyqtSignal(int, int)
+    SCALED_CACHE_SIZE = 8
+
     def __init__(self, image=None, parent=None):
         super().__init__(parent)
         self.scroll_area = QScrollArea()
         self.image_label = QLabel()
         self.image = image or QImage("")
+        self._version = None
+        self._pixmap = QPixmap()
+        self._scaled_pixmaps = OrderedDict()
+        self._drag_position = None
 
         self.image_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.image_label.setVisible(False)
@@ -30,15 +42,69 @@ class ImageWindow(QMainWindow):
         self.scroll_area.setWidgetResizable(True)
         self.setCentralWidget(self.scroll_area)
 
-    def refresh(self, image):
+    def target_size(self) -> QSize:
+        return self.parent().size() if self.parent() else self.size()
+
+    def refresh(self, image, version=None):
         self.image = image or QImage("")
-        aspect_ratio_mode = Qt.AspectRatioMode.KeepAspectRatio
-        transformation_mode = Qt.TransformationMode.SmoothTransformation
-        pixmap = QPixmap.fromImage(self.image)
-        pixmap = pixmap.scaled(self.parent().size(), aspect_ratio_mode, transformation_mode)
-        self.image_label.setPixmap(pixmap)
+        if version is None or version != self._version:
+            self._version = version
+            with profiler.measure("display", "pixmap"):
+                self._pixmap = QPixmap.fromImage(self.image)
+            self._scaled_pixmaps.clear()
+        self.show_scaled()
         self.image_label.setVisible(True)
 
+    def show_scaled(self):
+        size = self.target_size()
+        key = (size.width(), size.height())
+        pixmap = self._scaled_pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self._pixmap
+            fitted = pixmap.size().scaled(size, Qt.AspectRatioMode.KeepAspectRatio)
+            if not pixmap.isNull() and fitted != pixmap.size():
+                with profiler.measure("display", "pixmap_scale"):
+                    pixmap = pixmap.scaled(fitted, Qt.AspectRatioMode.KeepAspectRatio,
+                                           Qt.TransformationMode.SmoothTransformation)
+            self._scaled_pixmaps[key] = pixmap
+            while len(self._scaled_pixmaps) > self.SCALED_CACHE_SIZE:
+                self._scaled_pixmaps.popitem(last=False)
+        self._scaled_pixmaps.move_to_end(key)
+        self.image_label.setPixmap(pixmap)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if not self._pixmap.isNull():
+            self.show_scaled()
+        size = self.target_size()
+        self.onResize.emit(size.width(), size.height())
+
+    def wheelEvent(self, event):
+        if not event.modifiers() & Qt.KeyboardModifier.ControlModifier or self._pixmap.isNull():
+            super().wheelEvent(event)
+            return
+        position = self.image_label.mapFrom(self, event.pos())
+        x = min(max(position.x() / max(1, self.image_label.width()), 0.0), 1.0)
+        y = min(max(position.y() / max(1, self.image_label.height()), 0.0), 1.0)
+        self.onZoom.emit(1 if event.angleDelta().y() > 0 else -1, x, y)
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_position = event.pos()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_position is not None:
+            delta = event.pos() - self._drag_position
+            self._drag_position = event.pos()
+            self.onPan.emit(delta.x(), delta.y())
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self._drag_position = None
+        super().mouseReleaseEvent(event)
+
 
 class Slider(QSlider):
     def __init__(self, parent=None):
@@ -1,15 +1,25 @@
+from model.profiling import profiler
 from view.Widgets import ImageWindow, Slider, EditWindow, UndoValueCommand, UndoRedoCommand
 
 import numpy as np
 from PyQt5.QtWidgets import (QMainWindow, QApplication, QStackedWidget, QFileDialog, QUndoStack, QSpinBox,
                              QVBoxLayout, QPushButton, QHBoxLayout, QWidget, QSizePolicy, QAction, QLabel)
 from PyQt5.QtGui import QImage, QIcon
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
 
 
 class ImageEditor(QMainWindow):
+    data_rendered = pyqtSignal(object, int)
+    export_progress = pyqtSignal(float)
+    export_finished = pyqtSignal(object)
+    image_loaded = pyqtSignal()
+
     def initUI(self, presenter):
         self.presenter = presenter
+        self.data_rendered.connect(self.set_data, Qt.ConnectionType.QueuedConnection)
+        self.export_progress.connect(self.show_export_progress, Qt.ConnectionType.QueuedConnection)
+        self.export_finished.connect(self.show_export_finished, Qt.ConnectionType.QueuedConnection)
+        self.image_loaded.connect(self.presenter.update_view, Qt.ConnectionType.QueuedConnection)
         self.create_central_widget()
         self.create_actions()
         self.setWindowTitle("Image Editor")
@@ -28,6 +38,26 @@ class ImageEditor(QMainWindow):
         save_action.triggered.connect(self.save_file)
         self.addAction(save_action)
 
+        cancel_export_action = QAction(self)
+        cancel_export_action.setShortcut("Ctrl+.")
+        cancel_export_action.triggered.connect(self.presenter.handle_cancel_export)
+        self.addAction(cancel_export_action)
+
+        zoom_in_action = QAction(self)
+        zoom_in_action.setShortcut("Ctrl+=")
+        zoom_in_action.triggered.connect(lambda: self.presenter.handle_zoom(1))
+        self.addAction(zoom_in_action)
+
+        zoom_out_action = QAction(self)
+        zoom_out_action.setShortcut("Ctrl+-")
+        zoom_out_action.triggered.connect(lambda: self.presenter.handle_zoom(-1))
+        self.addAction(zoom_out_action)
+
+        zoom_reset_action = QAction(self)
+        zoom_reset_action.setShortcut("Ctrl+0")
+        zoom_reset_action.triggered.connect(self.presenter.handle_zoom_reset)
+        self.addAction(zoom_reset_action)
+
         exit_action = QAction(self)
         exit_action.setShortcut("Ctrl+Q")
         exit_action.triggered.connect(self.close)
@@ -35,19 +65,30 @@ class ImageEditor(QMainWindow):
         self.undo_stack = QUndoStack(self)
         undo_action = QAction("Undo", self)
         undo_action.setShortcut("Ctrl+Z")
-        undo_action.triggered.connect(self.undo_stack.undo)
+        undo_action.triggered.connect(self.undo)
         self.addAction(undo_action)
         
         redo_action = QAction("Redo", self)
         redo_action.setShortcut("Ctrl+Y")
-        redo_action.triggered.connect(self.undo_stack.redo)
+        redo_action.triggered.connect(self.redo)
         self.addAction(redo_action)
 
+    def undo(self):
+        with self.presenter.batch():
+            self.undo_stack.undo()
+
+    def redo(self):
+        with self.presenter.batch():
+            self.undo_stack.redo()
+
     def create_central_widget(self):
         self.side_bar = self.create_sidebar()
         self.side_bar.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Expanding)
         self.image_label = ImageWindow(self)
         self.image_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.image_label.onResize.connect(self.presenter.handle_viewport_resized)
+        self.image_label.onZoom.connect(self.presenter.handle_zoom)
+        self.image_label.onPan.connect(self.presenter.handle_pan)
         
         widget = QWidget()
         layout = QHBoxLayout()
@@ -69,10 +110,10 @@ class ImageEditor(QMainWindow):
         open_btn.clicked.connect(self.open_file)
         open_btn.clicked.connect(lambda: self.undo_stack.clear())
 
-        light_window = self.create_light_window()
+        self.light_window = None
         edit_btn = QPushButton(QIcon("view/icons/edit.png"), "")
         edit_btn.setFlat(True)
-        edit_btn.clicked.connect(lambda: light_window.setVisible(not light_window.isVisible()))
+        edit_btn.clicked.connect(self.toggle_light_window)
 
         save_btn = QPushButton(QIcon("view/icons/download.png", ), "")
         save_btn.setFlat(True)
@@ -91,7 +132,7 @@ class ImageEditor(QMainWindow):
         hboxLayout.setSpacing(0)
         hboxLayout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
         hboxLayout.addLayout(sidebar_layout)
-        hboxLayout.addWidget(light_window)
+        self.light_window_layout = hboxLayout
 
         sidebar_widget = QWidget()
         sidebar_widget.setLayout(hboxLayout)
@@ -120,14 +161,22 @@ class ImageEditor(QMainWindow):
             stylesheet = f.read()
             app.setStyleSheet(stylesheet)
 
-    def set_data(self, data: np.ndarray):
+    def set_data(self, data: np.ndarray, version: int = None):
         if data is not None:
+            data = np.ascontiguousarray(data)
             h, w = data.shape[:2]
-            image = QImage(data, w, h, 3 * w, QImage.Format.Format_RGB888)
-            self.image_label.refresh(image)
+            if data.ndim == 3 and data.shape[2] == 3:
+                image_format = QImage.Format.Format_RGB888
+            else:
+                image_format = QImage.Format.Format_Grayscale8
+            with profiler.measure("display", "qimage"):
+                image = QImage(data, w, h, data.strides[0], image_format)
+            self._display_data = data
+            self.image_label.refresh(image, version)
         else:
+            self._display_data = None
             self.setWindowTitle("Image Editor")
-            self.image_label.refresh(None)
+            self.image_label.refresh(None, version)
 
     def open_file(self):
         dialog = QFileDialog()
@@ -148,6 +197,23 @@ class ImageEditor(QMainWindow):
             path = dialog.selectedFiles()[0]
             self.presenter.handle_save_file(path)
 
+    def show_export_progress(self, progress: float):
+        self.statusBar().showMessage(f"Exporting... {progress * 100:.0f}%")
+
+    def show_export_finished(self, job):
+        if job.error is not None:
+            self.statusBar().showMessage(f"Export failed: {job.error}")
+        elif job.cancelled:
+            self.statusBar().showMessage("Export cancelled", 3000)
+        else:
+            self.statusBar().showMessage(f"Saved {', '.join(job.written)}", 3000)
+
+    def toggle_light_window(self):
+        if self.light_window is None:
+            self.light_window = self.create_light_window()
+            self.light_window_layout.addWidget(self.light_window)
+        self.light_window.setVisible(not self.light_window.isVisible())
+
     def create_light_window(self):
         window = EditWindow()
         window.onCancel.connect(self.presenter.handle_cancel)
@@ -215,6 +281,8 @@ class ImageEditor(QMainWindow):
             value_label = QLabel("0")
             value_label.setAlignment(Qt.AlignmentFlag.AlignRight)
             slider.valueChanged.connect(lambda value: value_label.setText(str(value)))
+            slider.sliderPressed.connect(lambda: self.undo_stack.beginMacro(name))
+            slider.sliderReleased.connect(self.undo_stack.endMacro)
             name_label = QLabel(name)
 
             def on_accept():